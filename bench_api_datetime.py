@@ -0,0 +1,51 @@
+import argparse
+import contextlib
+import io
+import os
+import time
+import offline_standin
+
+# Per-tournament cost of decoding rating API timestamps (dateStart of
+# generated tournaments) with rating_api.parse_api_datetime and with
+# helpers.parse_date, which get_tourns and get_tourn_by_request used before.
+#   python bench_api_datetime.py --tourns 200
+
+
+def per_call_ms(fn, values):
+    start = time.perf_counter()
+    results = [fn(value) for value in values]
+    return (time.perf_counter() - start) * 1000 / len(values), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API timestamp decoding benchmark")
+    parser.add_argument("--tourns", type=int, default=200)
+    parser.add_argument("--timezone", type=str, default="Europe/Moscow")
+    args = parser.parse_args()
+
+    for var in ("PROJECT_ID", "TELEGRAM_API_TOKEN", "OBFUSCATION_TOKEN"):
+        os.environ.setdefault(var, "bench")
+    import helpers
+    import rating_api
+
+    fixtures = offline_standin.generate_fixtures(pages=args.tourns // 50 + 2)
+    values = [t["dateStart"] for t in fixtures["tournaments"][: args.tourns]]
+
+    def parse_date(value):
+        # parse_date prints every result
+        with contextlib.redirect_stdout(io.StringIO()):
+            return helpers.parse_date(value, args.timezone)[0]
+
+    # Loads dateparser outside of the timings
+    parse_date(values[0])
+    old_ms, old = per_call_ms(parse_date, values)
+    new_ms, new = per_call_ms(
+        lambda value: rating_api.parse_api_datetime(value, args.timezone), values
+    )
+    print(f"{'parse_date':20} {old_ms:8.3f} ms/tournament")
+    print(f"{'parse_api_datetime':20} {new_ms:8.3f} ms/tournament")
+    print(f"Same result for {sum(a == b for a, b in zip(old, new))} of {len(values)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import argparse
+import itertools
+import math
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+import offline_standin
+
+# End-to-end benchmark of /tourns, /poll, /stop and the system tick against
+# the offline stand-in (rating API and Telegram) and the Datastore emulator:
+#   gcloud beta emulators datastore start --no-store-on-disk
+#   $(gcloud beta emulators datastore env-init)
+#   python bench_commands.py --iterations 20 --latency 0.05 --pages 5
+
+CHAT_ID = -1001
+_update_ids = itertools.count(1)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def make_update(text):
+    update_id = next(_update_ids)
+    message = {
+        "message_id": update_id,
+        "chat": {"id": CHAT_ID, "type": "supergroup"},
+        "text": text,
+    }
+    return {"update_id": update_id, "message": message}
+
+
+def reset_caches():
+    import datastore
+    import helpers
+    import rating_api
+
+    rating_api._tourn_cache.clear()
+    rating_api._tourn_windows.clear()
+    rating_api._prefetched_window = None
+    rating_api._prefetch_checked_at = 0
+    helpers.normalize_tourn_name.cache_clear()
+    datastore._known_sync_requests.clear()
+    datastore._venue_played_tourns_refreshed_at.clear()
+    datastore._monitored_venues.clear()
+
+
+def get_scenarios():
+    import handlers
+
+    def command(text):
+        return lambda: handlers.process_update(make_update(text))
+
+    return [
+        ("/tourns", None, command("/tourns суббота 19:00")),
+        ("/rtourns", None, command("/rtourns 24.10")),
+        ("/poll", None, command("/poll 1,2,3 Выбираем до пятницы 20:00")),
+        ("/stop", command("/poll 1,2 Выбираем"), command("/stop")),
+        ("tick", None, handlers.system_tic_handler),
+    ]
+
+
+def run_scenario(server, setup, run, iterations, cold):
+    latencies = []
+    calls = []
+    for _ in range(iterations):
+        if cold:
+            reset_caches()
+        if setup:
+            setup()
+        before = sum(server.get_counters().values())
+        start = time.perf_counter()
+        run()
+        latencies.append(time.perf_counter() - start)
+        calls.append(sum(server.get_counters().values()) - before)
+
+    # Allocations are traced in a separate run, tracing slows everything down
+    if cold:
+        reset_caches()
+    if setup:
+        setup()
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return latencies, calls, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end command benchmark")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.05,
+        help="Seconds per rating API call",
+    )
+    parser.add_argument(
+        "--pages",
+        type=int,
+        default=5,
+        help="Pages of generated tournaments",
+    )
+    parser.add_argument("--fixtures", type=str, help="Fixtures file to replay")
+    parser.add_argument(
+        "--cold",
+        action="store_true",
+        help="Clear in-process caches before each run",
+    )
+    args = parser.parse_args()
+
+    if "DATASTORE_EMULATOR_HOST" not in os.environ:
+        print("DATASTORE_EMULATOR_HOST is not set, start the Datastore emulator first")
+        sys.exit(1)
+
+    if args.fixtures:
+        fixtures = offline_standin.load_fixtures(args.fixtures)
+    else:
+        fixtures = offline_standin.generate_fixtures(pages=args.pages)
+    server = offline_standin.start_server(fixtures, latency=args.latency)
+    os.environ["RATING_API_URL"] = server.url
+    os.environ["TELEGRAM_API_URL"] = server.url
+    os.environ.setdefault("TELEGRAM_API_TOKEN", "bench")
+    os.environ.setdefault("PROJECT_ID", "bench")
+    os.environ.setdefault("OBFUSCATION_TOKEN", "bench")
+
+    # The bot modules read the stand-in URLs from the environment on import
+    import datastore
+
+    venues = ",".join(fixtures["venue_requests"])
+    datastore.update_chat_config(CHAT_ID, None, venues=venues)
+
+    print(f"{'scenario':10} {'p50 ms':>8} {'p95 ms':>8} {'calls':>7} {'peak KiB':>9}")
+    for name, setup, run in get_scenarios():
+        latencies, calls, peak = run_scenario(
+            server, setup, run, args.iterations, args.cold
+        )
+        print(
+            f"{name:10} {percentile(latencies, 50) * 1000:8.1f} "
+            f"{percentile(latencies, 95) * 1000:8.1f} "
+            f"{statistics.mean(calls):7.1f} {peak / 1024:9.1f}"
+        )
+    print(f"Upstream calls by endpoint: {server.get_counters()}")
+
+
+if __name__ == "__main__":
+    main()
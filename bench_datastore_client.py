@@ -0,0 +1,77 @@
+import argparse
+import math
+import os
+import statistics
+import sys
+import time
+
+# Per-call cost of datastore.get_chat_config and datastore.fetch_data with the
+# process-wide client against a new client created for every call, as
+# get_datastore_client did before. Runs against the Datastore emulator:
+#   gcloud beta emulators datastore start --no-store-on-disk
+#   $(gcloud beta emulators datastore env-init)
+#   python bench_datastore_client.py --iterations 200
+
+CHAT_ID = -1001
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def timed(fn, iterations):
+    times = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Datastore client benchmark")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    if "DATASTORE_EMULATOR_HOST" not in os.environ:
+        print("DATASTORE_EMULATOR_HOST is not set, start the Datastore emulator first")
+        sys.exit(1)
+    for var in ("PROJECT_ID", "TELEGRAM_API_TOKEN", "OBFUSCATION_TOKEN"):
+        os.environ.setdefault(var, "bench")
+
+    import datastore
+    from google.cloud import datastore as gds
+
+    datastore.update_chat_config(CHAT_ID, None, timezone="Europe/Moscow")
+    datastore.store_data(CHAT_ID, [{"id": 1, "name": "Кубок"}])
+
+    shared_client = datastore.get_datastore_client
+
+    def new_client():
+        return datastore._TimedClient(gds.Client())
+
+    calls = [
+        ("get_chat_config", lambda: datastore.get_chat_config(CHAT_ID)),
+        ("fetch_data", lambda: datastore.fetch_data(CHAT_ID)),
+    ]
+    print(f"{'call':16} {'client':8} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8}")
+    for name, call in calls:
+        for label, get_client in (("shared", shared_client), ("per-call", new_client)):
+            datastore.get_datastore_client = get_client
+            try:
+                call()
+                times = timed(call, args.iterations)
+            finally:
+                datastore.get_datastore_client = shared_client
+            print(
+                f"{name:16} {label:8} {percentile(times, 50) * 1000:8.2f} "
+                f"{percentile(times, 95) * 1000:8.2f} "
+                f"{statistics.mean(times) * 1000:8.2f}"
+            )
+    times = timed(gds.Client, args.iterations)
+    print(f"Client() alone: {statistics.mean(times) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import argparse
+import os
+import re
+import time
+
+# Throughput of helpers.normalize_tourn_name on the tests/tourn_names.txt
+# corpus: uncached calls, memoized calls and the implementation before it
+# was precompiled and memoized.
+#   python bench_normalize.py --rounds 2000
+
+
+def original_normalize_tourn_name(name):
+    norm_text = re.sub(
+        " +",
+        " ",
+        re.sub(r"[^\w\s]", "", name.lower().replace("а/о", "").replace("ё", "е")),
+    )
+    for word in (
+        "асинхрон и", "синхрон и", "онлайн и", "офлайн и", "оффлайн и",
+        "асинхронный и", "синхронный и", "асинхронный", "синхронный",
+        "асинхрон", "синхрон", "онлайн", "офлайн", "оффлайн", "ua",
+    ):
+        norm_text = norm_text.replace(word, "")
+    return norm_text.strip()
+
+
+def throughput(fn, names, rounds, before_round=None):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        if before_round:
+            before_round()
+        for name in names:
+            fn(name)
+    return rounds * len(names) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="normalize_tourn_name benchmark")
+    parser.add_argument("--rounds", type=int, default=2000)
+    args = parser.parse_args()
+
+    for var in ("PROJECT_ID", "TELEGRAM_API_TOKEN", "OBFUSCATION_TOKEN"):
+        os.environ.setdefault(var, "bench")
+    import helpers
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    corpus = os.path.join(root, "tests", "tourn_names.txt")
+    with open(corpus, encoding="utf-8") as f:
+        names = [line.strip() for line in f if line.strip()]
+
+    results = [
+        ("original", throughput(original_normalize_tourn_name, names, args.rounds)),
+        (
+            "uncached",
+            throughput(
+                helpers.normalize_tourn_name,
+                names,
+                args.rounds,
+                helpers.normalize_tourn_name.cache_clear,
+            ),
+        ),
+        ("memoized", throughput(helpers.normalize_tourn_name, names, args.rounds)),
+    ]
+    for label, names_per_second in results:
+        print(f"{label:10} {names_per_second / 1000:10.1f} k names/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import contextlib
+import io
+import os
+import time
+
+# Time per helpers.parse_date call on inputs chats commonly use, through the
+# fast path and through dateparser (the fast path switched off). Inputs the
+# two paths resolve differently are listed after the timings.
+#   python bench_parse_date.py --rounds 20
+
+INPUTS = [
+    "25.10",
+    "01.03",
+    "24.10 19:00",
+    "05.11 19:30",
+    "завтра",
+    "завтра 18:00",
+    "завтра в 18",
+    "суббота",
+    "в субботу 13:00",
+    "пятницы 20:00",
+    "в пятницу в 20",
+    "воскресенье 10:00",
+    "во вторник",
+    "20:00",
+    "в 20",
+]
+TIMEZONE = "Europe/Moscow"
+
+
+def run(parse_date, rounds):
+    results = {}
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text in INPUTS:
+            results[text] = parse_date(text, TIMEZONE)
+    return (time.perf_counter() - start) * 1000 / (rounds * len(INPUTS)), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="parse_date benchmark")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    for var in ("PROJECT_ID", "TELEGRAM_API_TOKEN", "OBFUSCATION_TOKEN"):
+        os.environ.setdefault(var, "bench")
+    import helpers
+
+    def quiet_parse_date(text, timezone):
+        # parse_date prints every result
+        with contextlib.redirect_stdout(io.StringIO()):
+            return helpers.parse_date(text, timezone)
+
+    # Loads dateparser and its Russian locale outside of the timings
+    quiet_parse_date("через 2 дня", TIMEZONE)
+    fast_ms, fast = run(quiet_parse_date, args.rounds)
+    parse_common_date = helpers._parse_common_date
+    helpers._parse_common_date = lambda input_date, timezone: None
+    try:
+        slow_ms, slow = run(quiet_parse_date, args.rounds)
+    finally:
+        helpers._parse_common_date = parse_common_date
+
+    print(f"{'fast path':12} {fast_ms:8.3f} ms/call")
+    print(f"{'dateparser':12} {slow_ms:8.3f} ms/call")
+    for text in INPUTS:
+        if fast[text] != slow[text]:
+            print(f"{text!r:22} fast {fast[text][0]}  dateparser {slow[text][0]}")
+
+
+if __name__ == "__main__":
+    main()
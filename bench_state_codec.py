@@ -0,0 +1,129 @@
+import argparse
+import os
+import statistics
+import time
+import offline_standin
+import state_codec
+
+# Compares ChatState/VenuePlayedTourns entities stored as lists of embedded
+# entities (the old format) with encoded blobs: serialized entity size,
+# encode/decode time and, if DATASTORE_EMULATOR_HOST is set, put latency.
+#   python bench_state_codec.py --records 400
+
+
+def make_played_tourns(fixtures, records):
+    tourns = {t["id"]: t for t in fixtures["tournaments"]}
+    sync_reqs = list(fixtures["sync_requests"].values())
+    result = []
+    for i in range(records):
+        sync_req = sync_reqs[i % len(sync_reqs)]
+        tourn = tourns[sync_req["tournamentId"]]
+        result.append(
+            {
+                "sync_req_id": f"{sync_req['id']}{i}",
+                "tourn_id": tourn["id"],
+                "norm_name": tourn["name"].lower(),
+                "editors": ", ".join(
+                    sorted(e["name"][:1] + ". " + e["surname"] for e in tourn["editors"])
+                ),
+                "date": sync_req["dateStart"][:10],
+            }
+        )
+    return result
+
+
+def make_chat_data(fixtures, records):
+    return [
+        {"id": t["id"], "name": f"{t['name']} (36, R, 3.5, А. Иванов, Б. Смирнова)"}
+        for t in fixtures["tournaments"][:records]
+    ]
+
+
+def make_entity(kind, name, property_name, value):
+    from google.cloud import datastore
+
+    key = datastore.Key(kind, name, project="bench")
+    entity = datastore.Entity(key=key, exclude_from_indexes=(property_name,))
+    if isinstance(value, list):
+        items = []
+        for record in value:
+            item = datastore.Entity()
+            item.update(record)
+            items.append(item)
+        value = items
+    entity[property_name] = value
+    return entity
+
+
+def entity_size(entity):
+    from google.cloud.datastore.helpers import entity_to_protobuf
+
+    return entity_to_protobuf(entity)._pb.ByteSize()
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ChatState encoding benchmark")
+    parser.add_argument("--records", type=int, default=400, help="Played tournaments")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    fixtures = offline_standin.generate_fixtures(pages=10, requests_per_venue=200)
+    cases = [
+        (
+            "VenuePlayedTourns",
+            "played_tourns",
+            make_played_tourns(fixtures, args.records),
+            state_codec.PLAYED_TOURNS_FIELDS,
+            state_codec.PLAYED_TOURNS_INTERNED,
+        ),
+        (
+            "ChatState",
+            "data",
+            make_chat_data(fixtures, 60),
+            state_codec.CHAT_DATA_FIELDS,
+            (),
+        ),
+    ]
+    client = None
+    if "DATASTORE_EMULATOR_HOST" in os.environ:
+        from google.cloud import datastore
+
+        client = datastore.Client(project="bench")
+
+    print(
+        f"{'entity':18} {'records':>7} {'old B':>8} {'new B':>8} "
+        f"{'enc ms':>7} {'dec ms':>7} {'old put':>8} {'new put':>8}"
+    )
+    for kind, property_name, records, fields, interned in cases:
+        blob, _ = state_codec.encode_records(records, fields, interned)
+        assert state_codec.decode_records(blob) == records
+        old_entity = make_entity(kind, "old", property_name, records)
+        new_entity = make_entity(kind, "new", property_name, blob)
+        encode_ms = timed(
+            lambda: state_codec.encode_records(records, fields, interned), args.repeat
+        )
+        decode_ms = timed(lambda: state_codec.decode_records(blob), args.repeat)
+        old_put = new_put = "-"
+        if client:
+            old_entity.key = client.key(kind, "old")
+            new_entity.key = client.key(kind, "new")
+            old_put = f"{timed(lambda: client.put(old_entity), args.repeat):.1f}"
+            new_put = f"{timed(lambda: client.put(new_entity), args.repeat):.1f}"
+        print(
+            f"{kind:18} {len(records):7} {entity_size(old_entity):8} "
+            f"{entity_size(new_entity):8} {encode_ms:7.2f} {decode_ms:7.2f} "
+            f"{old_put:>8} {new_put:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Thread-safe in-process LRU cache with per-entry expiration.
+    Entries older than max_age (ttl by default) are treated as missing,
+    the least recently used entry is evicted when maxsize is exceeded.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, max_age=None):
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[1] > min(max_age, self.ttl):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, stored_at=None):
+        with self._lock:
+            self._entries[key] = (value, time.time() if stored_at is None else stored_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_load(self, key, loader, max_age=None):
+        """
+        Returns the cached value or stores and returns loader() on a miss.
+        Concurrent misses for the same key wait for the first caller's load
+        instead of calling loader themselves. Empty results are not cached.
+        """
+        value = self.get(key, max_age=max_age)
+        if value is not None:
+            return value
+        with self._lock:
+            loading = self._loading.get(key)
+            is_loader = loading is None
+            if is_loader:
+                loading = {"event": threading.Event(), "value": None}
+                self._loading[key] = loading
+            else:
+                self.coalesced += 1
+        if not is_loader:
+            loading["event"].wait()
+            return loading["value"]
+        try:
+            loading["value"] = loader()
+            if loading["value"]:
+                self.set(key, loading["value"])
+            return loading["value"]
+        finally:
+            with self._lock:
+                del self._loading[key]
+            loading["event"].set()
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return entry[0] if entry else None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+            }
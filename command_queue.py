@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+import cache
+import handlers
+import helpers
+
+WORKERS = 4
+# "cloud_tasks" answers the webhook right away and keeps the update in a Cloud
+# Tasks queue until a worker request handles it. "local" also answers right
+# away but loses updates still queued when the instance shuts down, "inline"
+# keeps the webhook request open until the update is handled.
+DEFAULT_BACKEND = "cloud_tasks"
+BACKEND = os.environ.get("COMMAND_QUEUE_BACKEND", DEFAULT_BACKEND)
+# Cloud Tasks posts updates back to this route of the app
+WORKER_PATH = "/worker"
+# Telegram redelivers updates it considers unanswered, remember recent ones
+SEEN_UPDATES_TTL = 10 * 60
+
+
+class LocalBackend:
+    """Executes updates on an in-process thread pool."""
+
+    defers = True
+
+    def __init__(self, execute):
+        self._execute = execute
+        self._executor = ThreadPoolExecutor(max_workers=WORKERS)
+
+    def submit(self, update, received_at):
+        self._executor.submit(self._execute, update, received_at)
+
+
+class InlineBackend:
+    """Executes updates synchronously inside the webhook request."""
+
+    defers = False
+
+    def __init__(self, execute):
+        self._execute = execute
+
+    def submit(self, update, received_at):
+        self._execute(update, received_at)
+
+
+class CloudTasksBackend:
+    """
+    Adds every update as an App Engine task of the CLOUD_TASKS_QUEUE queue,
+    the task posts it back to WORKER_PATH where execute_task() runs it.
+    Tasks are retried if the worker instance goes away before answering.
+    """
+
+    defers = True
+
+    def __init__(self, execute, client=None):
+        self._execute = execute
+        if client is None:
+            # Imported on first use like google.cloud.datastore
+            from google.cloud import tasks_v2
+
+            client = tasks_v2.CloudTasksClient()
+        self._client = client
+        self._queue = client.queue_path(
+            helpers.PROJECT_ID, helpers.CLOUD_TASKS_LOCATION, helpers.CLOUD_TASKS_QUEUE
+        )
+
+    def submit(self, update, received_at):
+        from google.api_core import exceptions
+
+        update_id = update["update_id"]
+        # Cloud Tasks refuses a second task with the same name, which also
+        # drops updates Telegram redelivers to another instance. A hash
+        # prefix spreads the names, sequential ones slow the queue down.
+        prefix = hashlib.md5(str(update_id).encode()).hexdigest()[:8]
+        payload = {
+            "update": update,
+            "queued_for": time.monotonic() - received_at,
+            "queued_at": time.time(),
+        }
+        task = {
+            "name": f"{self._queue}/tasks/{prefix}-{update_id}",
+            "app_engine_http_request": {
+                "http_method": "POST",
+                "relative_uri": f"{WORKER_PATH}{helpers.OBFUSCATION_TOKEN}",
+                "headers": {"Content-Type": "application/json"},
+                "body": json.dumps(payload, ensure_ascii=False).encode("utf-8"),
+            },
+        }
+        try:
+            self._client.create_task(parent=self._queue, task=task)
+        except exceptions.AlreadyExists:
+            print(f"Update {update_id} is already queued")
+        except exceptions.GoogleAPIError as e:
+            # The update is not lost, the webhook answer just waits for it
+            print(f"Error queueing update {update_id} {e}, executing it inline")
+            self._execute(update, received_at)
+
+
+# Other task queues can be plugged in with register_backend(), a backend takes
+# the execute callback and provides submit(update, received_at). Backends that
+# answer the webhook before the update is handled set defers.
+BACKENDS = {
+    "cloud_tasks": CloudTasksBackend,
+    "local": LocalBackend,
+    "inline": InlineBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+_seen_updates = cache.TTLCache(1000, SEEN_UPDATES_TTL)
+_stats_lock = threading.Lock()
+_stats = {
+    "queued": 0,
+    "duplicates": 0,
+    "in_progress": 0,
+    "done": 0,
+    "acked": 0,
+    "ack_total": 0.0,
+    "ack_max": 0.0,
+    "command_total": 0.0,
+    "command_max": 0.0,
+}
+
+
+def register_backend(name, backend_class):
+    BACKENDS[name] = backend_class
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if BACKEND not in BACKENDS:
+                    print(
+                        f"Unknown command queue backend {BACKEND}, "
+                        f"using {DEFAULT_BACKEND}"
+                    )
+                _backend = BACKENDS.get(BACKEND, BACKENDS[DEFAULT_BACKEND])(execute)
+    return _backend
+
+
+def _record(counter, latency):
+    with _stats_lock:
+        _stats[counter + "_total"] += latency
+        _stats[counter + "_max"] = max(_stats[counter + "_max"], latency)
+
+
+def execute(update, received_at):
+    with _stats_lock:
+        _stats["in_progress"] += 1
+    try:
+        handlers.process_update(update)
+    except Exception as e:
+        print(f"Error executing update {update.get('update_id')} {e}")
+        print(traceback.format_exc())
+    finally:
+        latency = time.monotonic() - received_at
+        _record("command", latency)
+        with _stats_lock:
+            _stats["in_progress"] -= 1
+            _stats["done"] += 1
+        print(f"Update {update.get('update_id')} done in {latency:.3f}s")
+
+
+def execute_task(payload):
+    """Runs an update posted back by CloudTasksBackend."""
+    # Monotonic clocks of different instances cannot be compared
+    waited = payload["queued_for"] + max(0.0, time.time() - payload["queued_at"])
+    execute(payload["update"], time.monotonic() - waited)
+
+
+def enqueue(update, received_at):
+    """
+    Hands a validated Telegram update over to the configured backend.
+    Returns False for updates that were already received.
+    """
+    update_id = update["update_id"]
+    if _seen_updates.get(update_id) is not None:
+        with _stats_lock:
+            _stats["duplicates"] += 1
+        return False
+    _seen_updates.set(update_id, True)
+    with _stats_lock:
+        _stats["queued"] += 1
+    backend = get_backend()
+    backend.submit(update, received_at)
+    # An inline backend has already run the command, its latency is recorded
+    # as command latency
+    if backend.defers:
+        _record("ack", time.monotonic() - received_at)
+        with _stats_lock:
+            _stats["acked"] += 1
+    return True
+
+
+def get_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    for counter, count in (("ack", stats["acked"]), ("command", stats["done"])):
+        stats[counter + "_avg"] = stats[counter + "_total"] / count if count else 0.0
+        del stats[counter + "_total"]
+    return stats
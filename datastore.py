@@ -1,59 +1,181 @@
 # -*- coding: utf-8 -*-
 
-from google.cloud import datastore
 import datetime
+import json
+import threading
 import pytz
 from dateutil.relativedelta import relativedelta
 import rating_api
+import cache
+import metrics
+import state_codec
+
+KNOWN_SYNC_REQUEST_DAYS = 7
+DELETE_BATCH_SIZE = 500
+PUT_BATCH_SIZE = 500
+GET_BATCH_SIZE = 1000
+CLAIM_BATCH_SIZE = 25
+VENUE_PLAYED_TOURNS_REFRESH = 60 * 60
+# Subscription changes made on other instances reach the tick within this time
+MONITORED_VENUES_TTL = 5 * 60
+# A blob property can hold up to 1 MiB
+PREFETCHED_TOURNS_MAX_SIZE = 1000 * 1000
+
+# When this instance last refreshed the played tournaments index of each venue
+_venue_played_tourns_refreshed_at = {}
+
+# venue_id -> [chat_ids] read from VenueSubscription keys
+_monitored_venues = cache.TTLCache(1, MONITORED_VENUES_TTL)
+_monitored_venues_migrated = False
+
+# Sync requests already known to be announced, shared by all threads of the instance
+_known_sync_requests = cache.TTLCache(10000, KNOWN_SYNC_REQUEST_DAYS * 24 * 60 * 60)
+
+
+_datastore_client = None
+_datastore_client_lock = threading.Lock()
+
+_TIMED_METHODS = ("get", "get_multi", "put", "put_multi", "delete", "delete_multi")
+
+
+class _TimedClient:
+    """Datastore client wrapper that times every RPC with metrics.span()."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name not in _TIMED_METHODS:
+            return attr
+
+        def timed(*args, **kwargs):
+            with metrics.span("datastore", name):
+                return attr(*args, **kwargs)
+
+        return timed
+
+    def query(self, **kwargs):
+        return _TimedQuery(self._client.query(**kwargs))
+
+    def transaction(self, **kwargs):
+        return _TimedTransaction(self._client.transaction(**kwargs))
+
+
+class _TimedQuery:
+    def __init__(self, query):
+        self._query = query
+
+    def __getattr__(self, name):
+        return getattr(self._query, name)
+
+    def fetch(self, *args, **kwargs):
+        # Results are read eagerly so the span covers all result pages
+        with metrics.span("datastore", "query"):
+            return list(self._query.fetch(*args, **kwargs))
+
+
+class _TimedTransaction:
+    def __init__(self, transaction):
+        self._transaction = transaction
+
+    def __getattr__(self, name):
+        return getattr(self._transaction, name)
+
+    def __enter__(self):
+        with metrics.span("datastore", "begin_transaction"):
+            self._transaction.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        with metrics.span("datastore", "commit"):
+            return self._transaction.__exit__(*exc_info)
 
 
 def get_datastore_client():
-    return datastore.Client()
+    """
+    Returns the process-wide Datastore client, created on first use.
+    The client is thread-safe and reuses its credentials and channel.
+    """
+    global _datastore_client
+    if _datastore_client is None:
+        with _datastore_client_lock:
+            if _datastore_client is None:
+                # Imported on first use, google.cloud.datastore takes a noticeable
+                # part of the instance start time
+                from google.cloud import datastore
+
+                _datastore_client = _TimedClient(datastore.Client())
+    return _datastore_client
+
+def _new_entity(key, exclude_from_indexes=()):
+    from google.cloud import datastore
+
+    return datastore.Entity(key=key, exclude_from_indexes=exclude_from_indexes)
 
 def store_data(chat_id, tourns_to_save):
+    """
+    Saves the last /tourns list of the chat. The write is skipped if the
+    stored list has the same content hash. Returns True if it was written.
+    """
+    data, data_hash = state_codec.encode_records(
+        tourns_to_save, state_codec.CHAT_DATA_FIELDS
+    )
     datastore_client = get_datastore_client()
     key = datastore_client.key("ChatState", str(chat_id))
-    with datastore_client.transaction():
-        entity = datastore_client.get(key)
-        if not entity:
-            entity = datastore.Entity(key=key, exclude_from_indexes=("data", "played_tourns"))
-        entity.update({"data": tourns_to_save})
-        datastore_client.put(entity)
+    # Only /tourns of the chat itself writes its state, the last write wins
+    # with or without a transaction
+    entity = datastore_client.get(key)
+    if entity and entity.get("data_hash") == data_hash:
+        return False
+    if not entity:
+        entity = _new_entity(key)
+    entity.exclude_from_indexes.update(("data", "data_hash"))
+    # Left over from the time played tournaments were kept per chat
+    entity.pop("played_tourns", None)
+    entity.update({"data": data, "data_hash": data_hash})
+    datastore_client.put(entity)
+    return True
 
 def fetch_data(chat_id):
     datastore_client = get_datastore_client()
     entity = datastore_client.get(datastore_client.key("ChatState", str(chat_id)))
     if entity and "data" in entity:
-        return entity["data"]
+        return state_codec.decode_records(entity["data"])
     return []
 
-def traverse_finished_tasks():
+def count_chat_tasks(chat_id):
     datastore_client = get_datastore_client()
     query = datastore_client.query(kind="PollTask")
-    
+    query.add_filter("chat_id", "=", chat_id)
+    query.keys_only()
+    return len(list(query.fetch()))
+
+def traverse_finished_tasks():
+    datastore_client = get_datastore_client()
     now = int(datetime.datetime.now().timestamp())
+
+    # Only due tasks are fetched, a tick with no expired polls costs one query
+    query = datastore_client.query(kind="PollTask")
+    query.add_filter("end_time", "<=", now)
+    finished_tasks = list(query.fetch())
+    if not finished_tasks:
+        return
+
     chat_task_counts = {}
-    finished_tasks = []
-    
-    all_tasks = list(query.fetch())
-    for task in all_tasks:
-        cid = task.get("chat_id")
-        chat_task_counts[cid] = chat_task_counts.get(cid, 0) + 1
-        
-        if task.get("end_time", 0) <= now:
-            finished_tasks.append(task)
-            
     for task in finished_tasks:
         cid = task.get("chat_id")
-        has_multiple_candidates = chat_task_counts[cid] > 1
-        
-        valid = False
+        if cid not in chat_task_counts:
+            chat_task_counts[cid] = count_chat_tasks(cid)
+
+    for i in range(0, len(finished_tasks), CLAIM_BATCH_SIZE):
+        keys = [task.key for task in finished_tasks[i : i + CLAIM_BATCH_SIZE]]
         with datastore_client.transaction():
-            if datastore_client.get(task.key):
-                datastore_client.delete(task.key)
-                valid = True
-        
-        if valid:
+            claimed_tasks = datastore_client.get_multi(keys)
+            datastore_client.delete_multi([task.key for task in claimed_tasks])
+
+        for task in claimed_tasks:
+            has_multiple_candidates = chat_task_counts.get(task.get("chat_id"), 0) > 1
             yield dict(task), has_multiple_candidates
 
 def remove_task(chat_id, message_id):
@@ -92,7 +214,7 @@ def pop_task(chat_id, message_id):
 def add_task(chat_id, message_id, end_time_ts, tourn_ids, with_results):
     datastore_client = get_datastore_client()
     key = datastore_client.key("PollTask", f"{chat_id}_{message_id}")
-    entity = datastore.Entity(key=key)
+    entity = _new_entity(key)
     entity.update({
         "chat_id": chat_id,
         "message_id": message_id,
@@ -102,24 +224,83 @@ def add_task(chat_id, message_id, end_time_ts, tourn_ids, with_results):
     })
     datastore_client.put(entity)
 
+def _subscription_key(datastore_client, venue_id, chat_id):
+    return datastore_client.key("VenueSubscription", f"{venue_id}:{chat_id}")
+
+def migrate_monitored_venues():
+    """
+    Converts the MonitoredVenues/main entity used before VenueSubscription
+    into subscription entities and deletes it. Pairs are checked against
+    the chat configs, which may have changed since main was last written.
+    Returns the number of subscriptions created.
+    """
+    datastore_client = get_datastore_client()
+    monitored_key = datastore_client.key("MonitoredVenues", "main")
+    monitored_entity = datastore_client.get(monitored_key)
+    if not monitored_entity:
+        return 0
+    venues = monitored_entity.get("venues", {})
+    chat_ids = set(chat_id for chat_ids in venues.values() for chat_id in chat_ids)
+    chat_configs = get_chat_configs(chat_ids)
+    entities = []
+    for venue_id, chat_ids in venues.items():
+        for chat_id in chat_ids:
+            if venue_id not in chat_configs.get(chat_id, {}).get("venues", []):
+                continue
+            entity = _new_entity(_subscription_key(datastore_client, venue_id, chat_id))
+            entity.update({"venue_id": venue_id, "chat_id": chat_id})
+            entities.append(entity)
+    for i in range(0, len(entities), PUT_BATCH_SIZE):
+        datastore_client.put_multi(entities[i : i + PUT_BATCH_SIZE])
+    datastore_client.delete(monitored_key)
+    _monitored_venues.clear()
+    print(f"Migrated {len(entities)} venue subscriptions from MonitoredVenues")
+    return len(entities)
+
+def _load_monitored_venues():
+    global _monitored_venues_migrated
+    if not _monitored_venues_migrated:
+        migrate_monitored_venues()
+        _monitored_venues_migrated = True
+    datastore_client = get_datastore_client()
+    query = datastore_client.query(kind="VenueSubscription")
+    query.keys_only()
+    venues = {}
+    for entity in query.fetch():
+        venue_id, chat_id = entity.key.name.rsplit(":", 1)
+        venues.setdefault(venue_id, []).append(chat_id)
+    return venues
+
 def get_monitored_venues():
+    """
+    Returns {venue_id: [chat_ids]} of all venue subscriptions. Read with a
+    keys-only query and cached for MONITORED_VENUES_TTL seconds.
+    """
+    return _monitored_venues.get_or_load("venues", _load_monitored_venues)
+
+def get_pending_venues():
     datastore_client = get_datastore_client()
-    key = datastore_client.key("MonitoredVenues", "main")
-    entity = datastore_client.get(key)
-    if entity and "venues" in entity:
-        return entity["venues"]
-    return {}
+    entity = datastore_client.get(datastore_client.key("TickState", "venues"))
+    if entity and "pending_venues" in entity:
+        return entity["pending_venues"]
+    return []
+
+def set_pending_venues(venue_ids):
+    datastore_client = get_datastore_client()
+    entity = _new_entity(datastore_client.key("TickState", "venues"))
+    entity.update({"pending_venues": venue_ids})
+    datastore_client.put(entity)
 
 
 def update_chat_config(chat_id, thread_id, **kwargs):
     datastore_client = get_datastore_client()
     chat_key = datastore_client.key("ChatConfig", str(chat_id))
-    monitored_key = datastore_client.key("MonitoredVenues", "main")
     
     with datastore_client.transaction():
         entity = datastore_client.get(chat_key)
         if not entity:
-            entity = datastore.Entity(key=chat_key)
+            entity = _new_entity(chat_key)
+        old_venues = set(entity.get("venues", []))
 
         if thread_id is not None:
             entity["thread_id"] = thread_id
@@ -133,32 +314,29 @@ def update_chat_config(chat_id, thread_id, **kwargs):
         datastore_client.put(entity)
 
         if "venues" in kwargs:
-            new_venues = entity["venues"]
-            
-            monitored_entity = datastore_client.get(monitored_key)
-            if not monitored_entity:
-                monitored_entity = datastore.Entity(key=monitored_key)
-                monitored_entity["venues"] = {}
-                
-            venues = monitored_entity.get("venues", {})
-            
-            for v_id in list(venues.keys()):
-                if str(chat_id) in venues[v_id]:
-                    venues[v_id].remove(str(chat_id))
-                if not venues[v_id]:
-                    del venues[v_id]
-                    
-            for v_id in new_venues:
-                v_id_str = str(v_id).strip()
-                if not v_id_str:
-                    continue
-                if v_id_str not in venues:
-                    venues[v_id_str] = []
-                if str(chat_id) not in venues[v_id_str]:
-                    venues[v_id_str].append(str(chat_id))
-                    
-            monitored_entity["venues"] = venues
-            datastore_client.put(monitored_entity)
+            # Only subscriptions of the venues added or removed are written
+            new_venues = set(str(v_id).strip() for v_id in entity["venues"])
+            new_venues.discard("")
+            removed_venues = old_venues - new_venues
+            if removed_venues:
+                datastore_client.delete_multi(
+                    [
+                        _subscription_key(datastore_client, v_id, chat_id)
+                        for v_id in removed_venues
+                    ]
+                )
+            added_entities = []
+            for v_id in new_venues - old_venues:
+                subscription = _new_entity(
+                    _subscription_key(datastore_client, v_id, chat_id)
+                )
+                subscription.update({"venue_id": v_id, "chat_id": str(chat_id)})
+                added_entities.append(subscription)
+            if added_entities:
+                datastore_client.put_multi(added_entities)
+
+    if "venues" in kwargs:
+        _monitored_venues.clear()
 
 def get_all_configs():
     datastore_client = get_datastore_client()
@@ -172,96 +350,278 @@ def get_chat_config(chat_id):
     datastore_client = get_datastore_client()
     return datastore_client.get(datastore_client.key("ChatConfig", str(chat_id)))
 
-def get_played_tourns(venue_id, chat_id):
-    from helpers import normalize_tourn_name
+def get_chat_configs(chat_ids):
+    """
+    Returns ChatConfig entities of the given chats keyed by chat id string,
+    read with a single get_multi per 1000 keys.
+    """
     datastore_client = get_datastore_client()
-    from_date = (datetime.datetime.now(pytz.utc) - relativedelta(months=10)).strftime(
+    keys = [
+        datastore_client.key("ChatConfig", chat_id)
+        for chat_id in set(str(chat_id) for chat_id in chat_ids)
+    ]
+    configs = {}
+    for i in range(0, len(keys), GET_BATCH_SIZE):
+        for entity in datastore_client.get_multi(keys[i : i + GET_BATCH_SIZE]):
+            configs[entity.key.name] = entity
+    return configs
+
+def _decode_played_tourns(entity):
+    if not entity:
+        return []
+    return state_codec.decode_records(entity.get("played_tourns"))
+
+def _played_tourns_from_date():
+    return (datetime.datetime.now(pytz.utc) - relativedelta(months=10)).strftime(
         "%Y-%m-%d"
     )
 
-    key = datastore_client.key("ChatState", str(chat_id))
-    
-    # Needs transaction to ensure stored_played_tourns won't be overridden if modified simultaneously
+def update_venue_played_tourns(venue_id, force=False):
+    """
+    Incrementally refreshes the VenuePlayedTourns index of a venue with
+    sync requests accepted since the last refresh. Does nothing if the
+    index was refreshed less than VENUE_PLAYED_TOURNS_REFRESH seconds ago,
+    unless force is set. Returns the list of played tournaments.
+    """
+    from helpers import normalize_tourn_name
+    venue_id = str(venue_id)
+    now = datetime.datetime.now().timestamp()
+    refreshed_at = _venue_played_tourns_refreshed_at.get(venue_id)
+    if not force and refreshed_at and now - refreshed_at < VENUE_PLAYED_TOURNS_REFRESH:
+        return None
+
+    datastore_client = get_datastore_client()
+    key = datastore_client.key("VenuePlayedTourns", venue_id)
+    # When the index was last found up to date without being rewritten
+    check_key = datastore_client.key("VenuePlayedTournsCheck", venue_id)
+    entity = None
+    checked_at = 0
+    for found in datastore_client.get_multi([key, check_key]):
+        if found.key.kind == "VenuePlayedTourns":
+            entity = found
+            checked_at = max(checked_at, found.get("updated_at", 0))
+        else:
+            checked_at = max(checked_at, found.get("checked_at", 0))
+    if not force and entity and now - checked_at < VENUE_PLAYED_TOURNS_REFRESH:
+        _venue_played_tourns_refreshed_at[venue_id] = checked_at
+        return _decode_played_tourns(entity)
+
+    from_date = _played_tourns_from_date()
+    stored_played_tourns = [
+        t for t in _decode_played_tourns(entity) if t["date"] > from_date
+    ]
+    months = 1 if stored_played_tourns else 4
+
+    # Rating API calls are made outside of the transaction, the result is
+    # merged with whatever was stored in the meantime
+    sync_reqs = rating_api.get_sync_requests_ids(venue_id, months)
+    stored_sync_reqs = set(
+        [played_tourn["sync_req_id"] for played_tourn in stored_played_tourns]
+    )
+    new_played_tourns = []
+    for sync_req in sync_reqs:
+        if sync_req not in stored_sync_reqs:
+            tourn_id, tourn_date = rating_api.get_tourn_by_request(sync_req, "UTC")
+            if tourn_id:
+                tourn = rating_api.get_tourn_by_id(tourn_id, static_only=True)
+                if "name" not in tourn or "editors" not in tourn:
+                    print(f"Missing data for sync_req {sync_req}, tourn_id {tourn_id}")
+                new_played_tourns.append(
+                    {
+                        "sync_req_id": sync_req,
+                        "tourn_id": tourn_id,
+                        "norm_name": (
+                            normalize_tourn_name(tourn["name"])
+                            if "name" in tourn
+                            else ""
+                        ),
+                        "editors": (
+                            ", ".join(
+                                sorted(
+                                    [
+                                        editor["name"][:1] + ". " + editor["surname"]
+                                        for editor in tourn["editors"]
+                                    ]
+                                )
+                            )
+                            if "editors" in tourn
+                            else ""
+                        ),
+                        "date": tourn_date,
+                    }
+                )
+
     with datastore_client.transaction():
         entity = datastore_client.get(key)
         if not entity:
-            entity = datastore.Entity(key=key, exclude_from_indexes=("data", "played_tourns"))
-            
-        stored_played_tourns = [
-            t for t in entity.get("played_tourns", []) if t["date"] > from_date
+            entity = _new_entity(key)
+        played_tourns = [
+            t for t in _decode_played_tourns(entity) if t["date"] > from_date
         ]
-        
-        if stored_played_tourns:
-            months = 1
-        else:
-            months = 4
-            
-        sync_reqs = rating_api.get_sync_requests_ids(venue_id, months)
-        stored_sync_reqs = set(
-            [played_tourn["sync_req_id"] for played_tourn in stored_played_tourns]
+        played_sync_reqs = set(t["sync_req_id"] for t in played_tourns)
+        played_tourns += [
+            t for t in new_played_tourns if t["sync_req_id"] not in played_sync_reqs
+        ]
+        data, data_hash = state_codec.encode_records(
+            played_tourns,
+            state_codec.PLAYED_TOURNS_FIELDS,
+            state_codec.PLAYED_TOURNS_INTERNED,
         )
-        
-        for sync_req in sync_reqs:
-            if sync_req not in stored_sync_reqs:
-                tourn_id, tourn_date = rating_api.get_tourn_by_request(sync_req, chat_id)
-                if tourn_id:
-                    tourn = rating_api.get_tourn_by_id(tourn_id)
-                    if "name" not in tourn or "editors" not in tourn:
-                        print(f"Missing data for sync_req {sync_req}, tourn_id {tourn_id}")
-                    stored_played_tourns.append(
-                        {
-                            "sync_req_id": sync_req,
-                            "tourn_id": tourn_id,
-                            "norm_name": (
-                                normalize_tourn_name(tourn["name"])
-                                if "name" in tourn
-                                else ""
-                            ),
-                            "editors": (
-                                ", ".join(
-                                    sorted(
-                                        [
-                                            editor["name"][:1] + ". " + editor["surname"]
-                                            for editor in tourn["editors"]
-                                        ]
-                                    )
-                                )
-                                if "editors" in tourn
-                                else ""
-                            ),
-                            "date": tourn_date,
-                        }
-                    )
-                    
-        entity.update({"played_tourns": stored_played_tourns})
-        datastore_client.put(entity)
+        # An unchanged index is not rewritten, only the small check entity
+        # tells other instances it is up to date
+        if entity.get("played_tourns_hash") == data_hash:
+            check = _new_entity(check_key)
+            check["checked_at"] = now
+            datastore_client.put(check)
+        else:
+            entity.exclude_from_indexes.update(("played_tourns", "played_tourns_hash"))
+            entity.update(
+                {
+                    "played_tourns": data,
+                    "played_tourns_hash": data_hash,
+                    "updated_at": now,
+                }
+            )
+            datastore_client.put(entity)
+    _venue_played_tourns_refreshed_at[venue_id] = now
+    return played_tourns
+
+def get_played_tourns(venue_ids):
+    """
+    Returns tournaments played at the given venues as
+    {tourn_id: (norm_name, editors, date)}, read from the VenuePlayedTourns
+    index with one get_multi. The index is kept up to date by the system tick
+    and only built here for venues that have never been indexed.
+    """
+    venue_ids = [str(venue_id) for venue_id in venue_ids]
+    if not venue_ids:
+        return {}
+    datastore_client = get_datastore_client()
+    entities = datastore_client.get_multi(
+        [datastore_client.key("VenuePlayedTourns", venue_id) for venue_id in venue_ids]
+    )
+    from_date = _played_tourns_from_date()
+    played_tourns = []
+    for entity in entities:
+        played_tourns += _decode_played_tourns(entity)
+    indexed_venues = set(entity.key.name for entity in entities)
+    for venue_id in venue_ids:
+        if venue_id not in indexed_venues:
+            played_tourns += update_venue_played_tourns(venue_id, force=True)
     return {
         played_tourn["tourn_id"]: (
             played_tourn["norm_name"],
             played_tourn["editors"],
             played_tourn["date"],
         )
-        for played_tourn in stored_played_tourns
+        for played_tourn in played_tourns
+        if played_tourn["date"] > from_date
     }
 
-def is_known_sync_request(sync_req_id):
+def filter_unknown_sync_requests(sync_req_ids):
+    """
+    Returns the subset of sync_req_ids that were not announced yet.
+    IDs seen by this instance are answered from memory, the rest are
+    checked with a single get_multi.
+    """
+    unchecked_ids = [
+        str(sync_req_id)
+        for sync_req_id in sync_req_ids
+        if _known_sync_requests.get(str(sync_req_id)) is None
+    ]
+    if not unchecked_ids:
+        return set()
     datastore_client = get_datastore_client()
-    key = datastore_client.key("KnownSyncRequest", str(sync_req_id))
-    return datastore_client.get(key) is not None
+    known_entities = datastore_client.get_multi(
+        [datastore_client.key("KnownSyncRequest", sync_req_id) for sync_req_id in unchecked_ids]
+    )
+    for entity in known_entities:
+        _known_sync_requests.set(entity.key.name, True)
+    known_ids = set(entity.key.name for entity in known_entities)
+    return set(unchecked_ids) - known_ids
 
-def add_known_sync_request(sync_req_id):
+def add_known_sync_requests(sync_req_ids):
+    if not sync_req_ids:
+        return
     datastore_client = get_datastore_client()
-    key = datastore_client.key("KnownSyncRequest", str(sync_req_id))
-    entity = datastore.Entity(key=key)
-    entity.update({"added_at": datetime.datetime.now(pytz.utc)})
-    datastore_client.put(entity)
+    added_at = datetime.datetime.now(pytz.utc)
+    entities = []
+    for sync_req_id in sync_req_ids:
+        entity = _new_entity(datastore_client.key("KnownSyncRequest", str(sync_req_id)))
+        entity.update({"added_at": added_at})
+        entities.append(entity)
+    datastore_client.put_multi(entities)
+    for sync_req_id in sync_req_ids:
+        _known_sync_requests.set(str(sync_req_id), True)
+
+def is_known_sync_request(sync_req_id):
+    return not filter_unknown_sync_requests([sync_req_id])
+
+def add_known_sync_request(sync_req_id):
+    add_known_sync_requests([sync_req_id])
 
 def cleanup_old_sync_requests():
     datastore_client = get_datastore_client()
-    threshold = datetime.datetime.now(pytz.utc) - relativedelta(days=7)
+    threshold = datetime.datetime.now(pytz.utc) - relativedelta(days=KNOWN_SYNC_REQUEST_DAYS)
     query = datastore_client.query(kind="KnownSyncRequest")
     query.add_filter("added_at", "<", threshold)
-    
-    for entity in query.fetch():
-        datastore_client.delete(entity.key)
+    query.keys_only()
 
+    keys = [entity.key for entity in query.fetch()]
+    for i in range(0, len(keys), DELETE_BATCH_SIZE):
+        datastore_client.delete_multi(keys[i : i + DELETE_BATCH_SIZE])
+    return len(keys)
+
+def get_cached_tourn(tourn_id):
+    datastore_client = get_datastore_client()
+    entity = datastore_client.get(datastore_client.key("TournCache", str(tourn_id)))
+    if not entity or "data" not in entity:
+        return None
+    return json.loads(entity["data"]), entity.get("fetched_at", 0)
+
+def put_cached_tourn(tourn_id, tourn):
+    datastore_client = get_datastore_client()
+    key = datastore_client.key("TournCache", str(tourn_id))
+    entity = _new_entity(key, exclude_from_indexes=("data",))
+    entity.update({
+        "data": json.dumps(tourn, ensure_ascii=False),
+        "fetched_at": datetime.datetime.now().timestamp(),
+    })
+    datastore_client.put(entity)
+
+def get_prefetched_tourns():
+    """
+    Returns (first_day, last_day, fetched_at, tournaments) of the window
+    stored by put_prefetched_tourns(), or None.
+    """
+    datastore_client = get_datastore_client()
+    entity = datastore_client.get(datastore_client.key("TournWindow", "prefetch"))
+    if not entity or "data" not in entity:
+        return None
+    return (
+        datetime.date.fromisoformat(entity["first_day"]),
+        datetime.date.fromisoformat(entity["last_day"]),
+        entity["fetched_at"],
+        state_codec.decode_json(entity["data"]),
+    )
+
+def put_prefetched_tourns(first_day, last_day, fetched_at, tournaments):
+    """
+    Stores the prefetched window of tournaments for the other instances.
+    Returns False if it does not fit into an entity.
+    """
+    data = state_codec.encode_json(tournaments)
+    if len(data) > PREFETCHED_TOURNS_MAX_SIZE:
+        print(f"Warning: prefetched tournaments take {len(data)} bytes, not stored")
+        return False
+    datastore_client = get_datastore_client()
+    key = datastore_client.key("TournWindow", "prefetch")
+    entity = _new_entity(key, exclude_from_indexes=("data",))
+    entity.update({
+        "first_day": first_day.isoformat(),
+        "last_day": last_day.isoformat(),
+        "fetched_at": fetched_at,
+        "data": data,
+    })
+    datastore_client.put(entity)
+    return True
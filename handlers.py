@@ -1,14 +1,200 @@
 import traceback
 import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 import pytz
 
 import rating_api
+import rating_client
 import telegram_api
+import telegram_dispatcher
 import helpers
 import datastore
+import metrics
+
+VENUE_CONCURRENCY = 8
+SEND_CONCURRENCY = 8
+TICK_VENUES_BUDGET_SECONDS = 40
+# Commands reported separately in metrics, others are counted as "other"
+COMMANDS = (
+    "/tourns",
+    "/rtourns",
+    "/print",
+    "/poll",
+    "/stop",
+    "/cancel",
+    "/feedback",
+    "/settimezone",
+    "/setvenues",
+    "/setmindifficulty",
+    "/setmaxdifficulty",
+    "/help",
+)
+
+
+class SubscriberConfigs:
+    """
+    ChatConfigs of all venue subscribers, loaded with one get_multi the first
+    time an announcement needs them and reused for the rest of the tick.
+    """
+
+    def __init__(self, chat_ids):
+        self._chat_ids = chat_ids
+        self._configs = None
+        self._lock = threading.Lock()
+
+    def get(self, chat_id):
+        with self._lock:
+            if self._configs is None:
+                self._configs = datastore.get_chat_configs(self._chat_ids)
+        return self._configs.get(str(chat_id)) or {}
+
+
+def notify_sync_request(
+    venue_id, chat_ids, sync_req, tourn, chat_configs, send_pool
+):
+    tourn_name = tourn["name"]
+
+    representative_form, representative_is_feminine = (
+        helpers.get_person_form(sync_req["representative"])
+    )
+    if representative_is_feminine:
+        representative_text = "Представительница: " + representative_form
+    else:
+        representative_text = "Представитель: " + representative_form
+
+    narrator_form, narrator_is_feminine = helpers.get_person_form(
+        sync_req["narrator"]
+    )
+    if narrator_is_feminine:
+        narrator_text = "Ведущая: " + narrator_form
+    else:
+        narrator_text = "Ведущий: " + narrator_form
+
+    url = f'https://rating.chgk.info/tournament/{sync_req["tourn_id"]}'
+
+    def send_to_chat(chat_id):
+        chat_config = chat_configs.get(chat_id)
+        start_time = (
+            sync_req["dateStart"]
+            .astimezone(
+                pytz.timezone(
+                    helpers.resolve_timezone(chat_config.get("timezone"))
+                )
+            )
+            .strftime("%d.%m %H:%M")
+        )
+
+        telegram_api.send_formatted_message(
+            int(chat_id),
+            chat_config.get("thread_id", None),
+            f'Подана заявка на <a href="{url}">"{tourn_name}"</a>. {representative_text}. {narrator_text}. Начало: {start_time}',
+        )
+
+    futures = [
+        metrics.submit_in_context(send_pool, send_to_chat, chat_id)
+        for chat_id in chat_ids
+    ]
+    for future in futures:
+        try:
+            future.result()
+        except Exception as e:
+            print(f"Error notifying venue {venue_id} subscribers {e}")
+            print(traceback.format_exc())
+
+
+def process_venue(venue_id, chat_ids, chat_configs, send_pool):
+    start = time.monotonic()
+    try:
+        sync_reqs = rating_api.get_new_sync_requests(venue_id)
+        unknown_ids = datastore.filter_unknown_sync_requests(
+            [sync_req["id"] for sync_req in sync_reqs]
+        )
+        new_sync_reqs = []
+        for sync_req in sync_reqs:
+            if sync_req["id"] not in unknown_ids:
+                continue
+            tourn = rating_api.get_tourn_by_id(sync_req["tourn_id"], static_only=True)
+            if not tourn or not tourn.get("name"):
+                continue
+            new_sync_reqs.append((sync_req, tourn))
+
+        datastore.add_known_sync_requests(
+            [sync_req["id"] for sync_req, _ in new_sync_reqs]
+        )
+        for sync_req, tourn in new_sync_reqs:
+            notify_sync_request(
+                venue_id, chat_ids, sync_req, tourn, chat_configs, send_pool
+            )
+
+        datastore.update_venue_played_tourns(venue_id)
+    except Exception as e:
+        print(f"Error processing venue {venue_id} {e}")
+        print(traceback.format_exc())
+    return time.monotonic() - start
+
+
+def process_monitored_venues():
+    """
+    Checks monitored venues for new sync requests in parallel. Venues not
+    started within TICK_VENUES_BUDGET_SECONDS are stored and processed first
+    on the next tick.
+    """
+    tick_start = time.monotonic()
+    monitored_venues = datastore.get_monitored_venues()
+    pending_venues = datastore.get_pending_venues()
+    venue_ids = [v_id for v_id in pending_venues if v_id in monitored_venues]
+    venue_ids += [v_id for v_id in monitored_venues if v_id not in venue_ids]
+
+    chat_configs = SubscriberConfigs(
+        [chat_id for venue_id in venue_ids for chat_id in monitored_venues[venue_id]]
+    )
+
+    venue_pool = ThreadPoolExecutor(max_workers=VENUE_CONCURRENCY)
+    send_pool = ThreadPoolExecutor(max_workers=SEND_CONCURRENCY)
+    try:
+        futures = {
+            metrics.submit_in_context(
+                venue_pool,
+                process_venue,
+                venue_id,
+                monitored_venues[venue_id],
+                chat_configs,
+                send_pool,
+            ): venue_id
+            for venue_id in venue_ids
+        }
+        _, not_done = wait(futures, timeout=TICK_VENUES_BUDGET_SECONDS)
+        carried_over = [
+            futures[future] for future in not_done if future.cancel()
+        ]
+        wait(futures)
+    finally:
+        venue_pool.shutdown()
+        send_pool.shutdown()
+
+    if carried_over or pending_venues:
+        datastore.set_pending_venues(carried_over)
+
+    timings = {
+        futures[future]: round(future.result(), 2)
+        for future in futures
+        if not future.cancelled()
+    }
+    print(
+        f"Tick: processed {len(timings)}/{len(venue_ids)} venues, "
+        f"carried over {len(carried_over)}, "
+        f"{time.monotonic() - tick_start:.2f}s, per venue {timings}"
+    )
+
 
 def system_tic_handler():
-    telegram_api.set_webhook()
+    with metrics.command_span("tick"):
+        _system_tic()
+
+def _system_tic():
+    telegram_api.ensure_webhook()
     
     for task, multiple_candidates in datastore.traverse_finished_tasks():
         thread_id = None
@@ -25,62 +211,76 @@ def system_tic_handler():
             multiple_candidates=multiple_candidates,
         )
         
-    monitored_venues = datastore.get_monitored_venues()
-    for venue_id, chat_ids in monitored_venues.items():
-        sync_reqs = rating_api.get_new_sync_requests(venue_id)
-        if not sync_reqs:
-            continue
-            
-        for sync_req in sync_reqs:
-            if datastore.is_known_sync_request(sync_req["id"]):
-                continue
+    process_monitored_venues()
 
-            tourn = rating_api.get_tourn_by_id(sync_req["tourn_id"])
-            if not tourn or not tourn.get("name"):
-                continue
-            
-            datastore.add_known_sync_request(sync_req["id"])
-            tourn_name = tourn["name"]
-            
-            representative_form, representative_is_feminine = (
-                helpers.get_person_form(sync_req["representative"])
-            )
-            if representative_is_feminine:
-                representative_text = "Представительница: " + representative_form
-            else:
-                representative_text = "Представитель: " + representative_form
+    if rating_api.prefetch_tourn_windows():
+        print(f"Tournament windows prefetched: {rating_api.get_prefetch_stats()}")
 
-            narrator_form, narrator_is_feminine = helpers.get_person_form(
-                sync_req["narrator"]
-            )
-            if narrator_is_feminine:
-                narrator_text = "Ведущая: " + narrator_form
-            else:
-                narrator_text = "Ведущий: " + narrator_form
+    rating_client.log_connection_stats()
+    print(f"Tournament cache: {rating_api.get_tourn_cache_stats()}")
+    print(f"Telegram dispatcher: {telegram_dispatcher.get_stats()}")
 
-            url = f'https://rating.chgk.info/tournament/{sync_req["tourn_id"]}'
-            
-            for chat_id in chat_ids:
-                chat_config = datastore.get_chat_config(chat_id) or {}
-                start_time = (
-                    sync_req["dateStart"]
-                    .astimezone(
-                        pytz.timezone(
-                            helpers.resolve_timezone(chat_config.get("timezone"))
-                        )
-                    )
-                    .strftime("%d.%m %H:%M")
-                )
-                
-                telegram_api.send_formatted_message(
-                    int(chat_id),
-                    chat_config.get("thread_id", None),
-                    f'Подана заявка на <a href="{url}">"{tourn_name}"</a>. {representative_text}. {narrator_text}. Начало: {start_time}',
-                )
+def cleanup_handler():
+    with metrics.command_span("cleanup"):
+        removed = datastore.cleanup_old_sync_requests()
+        print(f"Cleanup: removed {removed} known sync requests")
 
 def command_handler(request):
     try:
         body = json.loads(request.data)
+    except ValueError as e:
+        print(f"Error decoding update {e}")
+        return ""
+    return process_update(body)
+
+def send_tourns_range(chat_id, thread_id, chat_context, date_range, only_rated):
+    """
+    /tourns for a range of days: one API sweep for the whole range, the list
+    is grouped by the days tournaments are available on and numbered
+    through, so /poll works with it as with a single day list.
+    """
+    first_day, last_day = date_range
+    played_tourns = datastore.get_played_tourns(chat_context.venues)
+    groups = rating_api.get_tourns_range(
+        first_day, last_day, played_tourns, chat_context, only_rated=only_rated
+    )
+    n_days = (last_day - first_day).days + 1
+    lines = [
+        f"Доступно с {first_day.strftime('%d.%m.%Y')} по {last_day.strftime('%d.%m.%Y')}:"
+    ]
+    all_to_save = []
+    for days, tourns in groups:
+        tourns_to_show, tourns_to_save = helpers.get_tourns_representations(tourns)
+        if len(days) == n_days:
+            title = "Все дни"
+        elif len(days) > 2 and (days[-1] - days[0]).days == len(days) - 1:
+            title = f"{days[0].strftime('%d.%m')}-{days[-1].strftime('%d.%m')}"
+        else:
+            title = ", ".join(day.strftime("%d.%m") for day in days)
+        lines.append(f"\n<b>{title}:</b>")
+        lines += [
+            f"{len(all_to_save) + i + 1}. {e}" for i, e in enumerate(tourns_to_show)
+        ]
+        all_to_save += tourns_to_save
+    datastore.store_data(chat_id, all_to_save)
+    telegram_api.send_multi_message(chat_id, thread_id, lines)
+
+def get_command_name(body):
+    """Metrics label of an update: the command, "poll_update" or "other"."""
+    if body and "message" in body and "text" in body["message"]:
+        words = body["message"]["text"].split()
+        if words and words[0] in COMMANDS:
+            return words[0]
+    if body and ("poll" in body or "poll_answer" in body):
+        return "poll_update"
+    return "other"
+
+def process_update(body):
+    with metrics.command_span(get_command_name(body)):
+        return _process_update(body)
+
+def _process_update(body):
+    try:
         # print(body)
         if body and "poll" in body:
             print(
@@ -95,36 +295,42 @@ def command_handler(request):
             inp = [s for s in body["message"]["text"].split() if not s.startswith("@")]
             # print(inp)
             chat_id = body["message"]["chat"]["id"]
+            chat_context = helpers.load_chat_context(chat_id)
             thread_id = None
             if (
                 "is_forum" in body["message"]["chat"]
                 and body["message"]["chat"]["is_forum"]
             ):
-                chat_config = datastore.get_chat_config(chat_id)
-                if chat_config:
-                    thread_id = chat_config.get("thread_id", None)
+                if chat_context.config:
+                    thread_id = chat_context.thread_id
                 else:
                     thread_id = body["message"].get("message_thread_id", None)
             if (inp[0] == "/tourns" or inp[0] == "/rtourns") and len(inp) > 1:
+                date_range = helpers.parse_date_range(
+                    " ".join(inp[1:]), chat_context.timezone
+                )
+                if date_range:
+                    send_tourns_range(
+                        chat_id,
+                        thread_id,
+                        chat_context,
+                        date_range,
+                        only_rated=inp[0] == "/rtourns",
+                    )
+                    return ""
                 tourn_date, with_time = helpers.parse_date(
-                    " ".join(inp[1:]), helpers.get_chat_timezone(chat_id)
+                    " ".join(inp[1:]), chat_context.timezone
                 )
                 if with_time:
                     header = f"Доступно на {tourn_date.strftime('%d.%m.%Y %H:%M')}:"
                 else:
                     header = f"Доступно на {tourn_date.strftime('%d.%m.%Y')}:"
-                played_tourns = {}
-                chat_config = datastore.get_chat_config(chat_id)
-                if chat_config and "venues" in chat_config:
-                    for venue_id in chat_config["venues"]:
-                        played_tourns.update(
-                            datastore.get_played_tourns(venue_id, chat_id)
-                        )
+                played_tourns = datastore.get_played_tourns(chat_context.venues)
                 only_rated = inp[0] == "/rtourns"
                 tourns_list = rating_api.get_tourns(
                     tourn_date,
                     played_tourns,
-                    chat_id,
+                    chat_context,
                     with_time=with_time,
                     only_rated=only_rated,
                 )
@@ -205,7 +411,7 @@ def command_handler(request):
                     split_title = title.lower().split("до")
                     if len(split_title) > 1:
                         closing_time, _ = helpers.parse_date(
-                            split_title[1], helpers.get_chat_timezone(chat_id)
+                            split_title[1], chat_context.timezone
                         )
                 else:
                     title = "Выбираем"
@@ -244,7 +450,7 @@ def command_handler(request):
                 telegram_api.send_message(
                     chat_id,
                     thread_id,
-                    "/settimezone <timezone> - настройка часового пояса чата\n/setvenues <venue_id1,venue_id2...> - настройка мониторинга заявок на списке площадок\n/setmindifficulty <min_difficulty> - настройка минимальной сложности турниров\n/setmaxdifficulty <max_difficulty> - настройка максимальной сложности турниров\n/tourns <YYYYMMDD>|<дата и время турнира> - список турниров на дату (и время)\n/rtourns <YYYYMMDD>|<дата и время турнира> - список рейтингуемых турниров на дату (и время)\n/poll <tourn_1,tourn_2,...> [title] [до <время окончания>]- создание голосовалки из 2-8 перечисленных номеров турниров\n/stop - как reply на сообщение с опросом, завершает его и подводит итоги\n/cancel - как reply на сообщение с опросом, завершает его без подведения итогов\n/feedback - опрос впечатлений о сыгранном пакете\n/help - эта подсказка",
+                    "/settimezone <timezone> - настройка часового пояса чата\n/setvenues <venue_id1,venue_id2...> - настройка мониторинга заявок на списке площадок\n/setmindifficulty <min_difficulty> - настройка минимальной сложности турниров\n/setmaxdifficulty <max_difficulty> - настройка максимальной сложности турниров\n/tourns <YYYYMMDD>|<дата и время турнира>|<дата>-<дата> - список турниров на дату (и время) или на диапазон дат\n/rtourns <YYYYMMDD>|<дата и время турнира>|<дата>-<дата> - список рейтингуемых турниров на дату (и время) или на диапазон дат\n/poll <tourn_1,tourn_2,...> [title] [до <время окончания>]- создание голосовалки из 2-8 перечисленных номеров турниров\n/stop - как reply на сообщение с опросом, завершает его и подводит итоги\n/cancel - как reply на сообщение с опросом, завершает его без подведения итогов\n/feedback - опрос впечатлений о сыгранном пакете\n/help - эта подсказка",
                 )
     except Exception as e:
         print(f"Error in command processing {e}")
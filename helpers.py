@@ -1,7 +1,7 @@
-from dateparser import parse
 import datetime
 import pytz
 import re
+from functools import lru_cache
 import rating_api
 from dateutil.relativedelta import relativedelta
 import os
@@ -10,6 +10,13 @@ import datastore
 PROJECT_ID = os.environ.get("PROJECT_ID")
 TELEGRAM_API_TOKEN = os.environ.get("TELEGRAM_API_TOKEN")
 OBFUSCATION_TOKEN = os.environ.get("OBFUSCATION_TOKEN")
+SHARED_TOURN_CACHE = os.environ.get("SHARED_TOURN_CACHE", "").lower() == "true"
+WEBHOOK_CHECK_INTERVAL = int(os.environ.get("WEBHOOK_CHECK_INTERVAL", 6 * 60 * 60))
+WEBHOOK_DELIVERY_GAP = int(os.environ.get("WEBHOOK_DELIVERY_GAP", 60 * 60))
+TOURN_PREFETCH_DAYS = int(os.environ.get("TOURN_PREFETCH_DAYS", 7))
+TOURN_PREFETCH_INTERVAL = int(os.environ.get("TOURN_PREFETCH_INTERVAL", 5 * 60))
+CLOUD_TASKS_LOCATION = os.environ.get("CLOUD_TASKS_LOCATION")
+CLOUD_TASKS_QUEUE = os.environ.get("CLOUD_TASKS_QUEUE", "commands")
 
 DEFAULT_TIMEZONE = "Europe/Berlin"
 DEFAULT_VENUE_ID = 3053
@@ -72,12 +79,114 @@ def get_person_form(person):
     )
     return person_form, is_feminine
 
+_WEEKDAYS = {
+    "понедельник": 0,
+    "понедельника": 0,
+    "вторник": 1,
+    "вторника": 1,
+    "среда": 2,
+    "среду": 2,
+    "среды": 2,
+    "четверг": 3,
+    "четверга": 3,
+    "пятница": 4,
+    "пятницу": 4,
+    "пятницы": 4,
+    "суббота": 5,
+    "субботу": 5,
+    "субботы": 5,
+    "воскресенье": 6,
+    "воскресенья": 6,
+}
+_TIME_PATTERN = r"(?:\s+(?:(?:в\s+)?(?P<hour>\d{1,2}):(?P<minute>\d{2})|в\s+(?P<only_hour>\d{1,2})))?"
+_DAY_MONTH_RE = re.compile(r"(?P<day>\d{1,2})\.(?P<month>\d{1,2})" + _TIME_PATTERN)
+_TOMORROW_RE = re.compile(r"завтра" + _TIME_PATTERN)
+_WEEKDAY_RE = re.compile(
+    r"(?:(?:в|во)\s+)?(?P<weekday>" + "|".join(_WEEKDAYS) + ")" + _TIME_PATTERN
+)
+_TIME_RE = re.compile(r"(?:в\s+)?(?P<hour>\d{1,2}):(?P<minute>\d{2})|в\s+(?P<only_hour>\d{1,2})")
+
+
+@lru_cache(maxsize=1024)
+def _match_common_date(text):
+    """
+    Recognizes the date formats chats use most: "DD.MM", "DD.MM HH:MM",
+    "завтра [в HH[:MM]]", "[в] <день недели> [в HH[:MM]]" and a time alone,
+    "[в] HH:MM" or "в HH".
+    Returns (kind, value, hour, minute) or None for anything else.
+    """
+    for kind, regex in (
+        ("day_month", _DAY_MONTH_RE),
+        ("tomorrow", _TOMORROW_RE),
+        ("weekday", _WEEKDAY_RE),
+        ("time", _TIME_RE),
+    ):
+        match = regex.fullmatch(text)
+        if not match:
+            continue
+        hour = match.group("hour") or match.group("only_hour")
+        minute = match.group("minute") or 0
+        if kind == "day_month":
+            value = (int(match.group("day")), int(match.group("month")))
+        elif kind == "weekday":
+            value = _WEEKDAYS[match.group("weekday")]
+        else:
+            value = None
+        return kind, value, int(hour) if hour is not None else None, int(minute)
+    return None
+
+
+def _parse_common_date(input_date, timezone):
+    """
+    Fast path of parse_date for the formats recognized by _match_common_date,
+    resolved the way dateparser resolves them with PREFER_DATES_FROM future.
+    Returns None if the input should be handed over to dateparser.
+    """
+    matched = _match_common_date(" ".join(input_date.lower().split()))
+    if not matched:
+        return None
+    kind, value, hour, minute = matched
+    if hour is not None and (hour > 23 or minute > 59):
+        return None
+    tz = pytz.timezone(timezone)
+    now = datetime.datetime.now(tz)
+    today = now.date()
+    if kind == "tomorrow":
+        if hour is None:
+            return now + datetime.timedelta(days=1)
+        result_date = today + datetime.timedelta(days=1)
+    elif kind == "day_month":
+        day, month = value
+        try:
+            result_date = datetime.date(today.year, month, day)
+            if result_date < today:
+                result_date = datetime.date(today.year + 1, month, day)
+        except ValueError:
+            return None
+    elif kind == "weekday":
+        result_date = today + datetime.timedelta(days=(value - today.weekday()) % 7)
+    else:
+        result_date = today
+    result_time = datetime.time(hour or 0, minute if hour is not None else 0)
+    result = tz.localize(datetime.datetime.combine(result_date, result_time))
+    # A weekday or a time that has passed means the next one
+    if kind in ("weekday", "time") and result <= now:
+        result_date += datetime.timedelta(days=7 if kind == "weekday" else 1)
+        result = tz.localize(datetime.datetime.combine(result_date, result_time))
+    return result
+
+
 def parse_date(input_date, timezone):
     try:
         result_date = datetime.datetime.strptime(input_date, "%Y%m%d").date()
         print(result_date)
         return result_date, False
     except:
+        result_date = _parse_common_date(input_date, timezone)
+        if result_date:
+            print(result_date)
+            return result_date, True
+
         normal_date = (
             input_date.replace("понедельника", "понедельник")
             .replace("вторника", "вторник")
@@ -88,6 +197,9 @@ def parse_date(input_date, timezone):
             .replace("воскресенья", "воскресенье")
         )
 
+        # dateparser is slow to import and only needed for uncommon formats
+        from dateparser import parse
+
         result_date = parse(
             normal_date,
             settings={
@@ -118,6 +230,77 @@ def parse_date(input_date, timezone):
 
         return result_date, True
 
+MAX_RANGE_DAYS = 14
+_RANGE_RE = re.compile(r"\s*(\S.*?)\s*[-–—]\s*(\S.*?)\s*")
+
+
+def _parse_range_day(input_day, timezone, first_day=None, year=None):
+    """
+    Resolves one end of a range to (day, kind), kind is "compact" for
+    YYYYMMDD or the kind of _match_common_date. The last end is resolved
+    relative to the first_day: a "DD.MM" or weekday end is the first such
+    day not before it. A first "DD.MM" end is taken in the given year, the
+    current one by default.
+    """
+    try:
+        return datetime.datetime.strptime(input_day, "%Y%m%d").date(), "compact"
+    except ValueError:
+        pass
+    matched = _match_common_date(" ".join(input_day.lower().split()))
+    if not matched:
+        return None, None
+    kind, value = matched[:2]
+    if kind == "time":
+        return None, None
+    if kind == "day_month":
+        day, month = value
+        if first_day:
+            year = first_day.year
+        elif year is None:
+            year = datetime.datetime.now(pytz.timezone(timezone)).year
+        try:
+            result = datetime.date(year, month, day)
+            if first_day and result < first_day:
+                result = datetime.date(year + 1, month, day)
+        except ValueError:
+            return None, None
+        return result, kind
+    if kind == "weekday" and first_day:
+        return first_day + datetime.timedelta(days=(value - first_day.weekday()) % 7), kind
+    result_date = _parse_common_date(input_day, timezone)
+    return (result_date.date(), kind) if result_date else (None, None)
+
+
+def parse_date_range(input_date, timezone):
+    """
+    Parses a range of days like "20261024-20261026" or "суббота-воскресенье",
+    each end in the YYYYMMDD format or one of the formats of _match_common_date.
+    Returns (first_day, last_day), or None if input_date is not such a range.
+    A range of "DD.MM" days that has already ended means next year's.
+    """
+    match = _RANGE_RE.fullmatch(input_date)
+    if not match:
+        return None
+    first_day, first_kind = _parse_range_day(match.group(1), timezone)
+    if not first_day:
+        return None
+    last_day, last_kind = _parse_range_day(match.group(2), timezone, first_day)
+    if first_kind == "day_month" and last_kind != "compact" and last_day:
+        today = datetime.datetime.now(pytz.timezone(timezone)).date()
+        if last_day < today:
+            first_day, _ = _parse_range_day(
+                match.group(1), timezone, year=first_day.year + 1
+            )
+            if not first_day:
+                return None
+            last_day, _ = _parse_range_day(match.group(2), timezone, first_day)
+    if not last_day or last_day < first_day:
+        return None
+    if (last_day - first_day).days >= MAX_RANGE_DAYS:
+        last_day = first_day + datetime.timedelta(days=MAX_RANGE_DAYS - 1)
+    return first_day, last_day
+
+
 def get_tourns_representations(tourns):
     tourns_to_save = []
     tourns_to_show = []
@@ -158,54 +341,95 @@ def get_tourns_representations(tourns):
         tourns_to_save.append({"id": tourn["id"], "name": tourn_short})
     return tourns_to_show, tourns_to_save
 
+_PUNCTUATION_RE = re.compile(r"а/о|[^\w\s]")
+_SPACES_RE = re.compile(" +")
+# Words describing the tournament format, removed in this order: removing one
+# can join the text around it into another one, so the order matters.
+_FORMAT_WORDS = (
+    "асинхрон и",
+    "синхрон и",
+    "онлайн и",
+    "офлайн и",
+    "оффлайн и",
+    "асинхронный и",
+    "синхронный и",
+    "асинхронный",
+    "синхронный",
+    "асинхрон",
+    "синхрон",
+    "онлайн",
+    "офлайн",
+    "оффлайн",
+    "ua",
+)
+
+
+@lru_cache(maxsize=4096)
 def normalize_tourn_name(name):
-    norm_text = re.sub(
-        " +",
-        " ",
-        re.sub(r"[^\w\s]", "", name.lower().replace("а/о", "").replace("ё", "е")),
-    )
-    return (
-        norm_text.replace("асинхрон и", "")
-        .replace("синхрон и", "")
-        .replace("онлайн и", "")
-        .replace("офлайн и", "")
-        .replace("оффлайн и", "")
-        .replace("асинхронный и", "")
-        .replace("синхронный и", "")
-        .replace("асинхронный", "")
-        .replace("синхронный", "")
-        .replace("асинхрон", "")
-        .replace("синхрон", "")
-        .replace("онлайн", "")
-        .replace("офлайн", "")
-        .replace("оффлайн", "")
-        .replace("ua", "")
-        .strip()
+    norm_text = _SPACES_RE.sub(
+        " ", _PUNCTUATION_RE.sub("", name.lower().replace("ё", "е"))
     )
+    for word in _FORMAT_WORDS:
+        if word in norm_text:
+            norm_text = norm_text.replace(word, "")
+    return norm_text.strip()
+
+_NOT_LOADED = object()
+
+
+class ChatContext:
+    """
+    Chat settings shared by everything handling an update. The ChatConfig
+    entity is read once, on first access to a setting, so updates that do
+    not need the settings cost no Datastore read.
+    """
+
+    def __init__(self, chat_id, chat_config=_NOT_LOADED):
+        self.chat_id = chat_id
+        self._config = chat_config
+
+    @property
+    def config(self):
+        if self._config is _NOT_LOADED:
+            self._config = datastore.get_chat_config(self.chat_id)
+        return self._config
+
+    @property
+    def timezone(self):
+        return resolve_timezone((self.config or {}).get("timezone"))
+
+    @property
+    def min_difficulty(self):
+        return (self.config or {}).get("min_difficulty", DEFAULT_MIN_DIFFICULTY)
+
+    @property
+    def max_difficulty(self):
+        return (self.config or {}).get("max_difficulty", DEFAULT_MAX_DIFFICULTY)
+
+    @property
+    def venues(self):
+        return (self.config or {}).get("venues", [])
+
+    @property
+    def thread_id(self):
+        return (self.config or {}).get("thread_id", None)
+
+
+def load_chat_context(chat_id):
+    """Returns the ChatContext of a chat, its settings are read on first use."""
+    return ChatContext(chat_id)
 
 def get_chat_timezone(chat_id):
-    chat_config = datastore.get_chat_config(chat_id)
-    if chat_config and "timezone" in chat_config:
-        return resolve_timezone(chat_config["timezone"])
-    return DEFAULT_TIMEZONE
+    return load_chat_context(chat_id).timezone
 
 def get_chat_min_difficulty(chat_id):
-    chat_config = datastore.get_chat_config(chat_id)
-    if chat_config and "min_difficulty" in chat_config:
-        return chat_config["min_difficulty"]
-    return DEFAULT_MIN_DIFFICULTY
+    return load_chat_context(chat_id).min_difficulty
 
 def get_chat_max_difficulty(chat_id):
-    chat_config = datastore.get_chat_config(chat_id)
-    if chat_config and "max_difficulty" in chat_config:
-        return chat_config["max_difficulty"]
-    return DEFAULT_MAX_DIFFICULTY
+    return load_chat_context(chat_id).max_difficulty
 
 def get_chat_venues(chat_id):
-    chat_config = datastore.get_chat_config(chat_id)
-    if chat_config and "venues" in chat_config:
-        return chat_config["venues"]
-    return []
+    return load_chat_context(chat_id).venues
 
 def get_default_poll_closing_time():
     return datetime.datetime.now() + relativedelta(months=1)
@@ -1,12 +1,24 @@
 import json
-from flask import Flask, request
+import time
+from flask import Flask, Response, request
 import telegram_api
+import telegram_dispatcher
 import helpers
 import handlers
+import command_queue
+import metrics
+import rating_api
+import rating_client
 
 
 app = Flask(__name__)
 
+metrics.register_gauges("rating_client", rating_client.get_connection_stats)
+metrics.register_gauges("tourn_cache", rating_api.get_tourn_cache_stats)
+metrics.register_gauges("tourn_prefetch", rating_api.get_prefetch_stats)
+metrics.register_gauges("telegram", telegram_dispatcher.get_stats)
+metrics.register_gauges("command_queue", command_queue.get_stats)
+
 
 @app.route("/")
 def hello():
@@ -29,12 +41,41 @@ def set_webhook():
 @app.route("/systemtic", methods=["GET"])
 def system_tic():
     handlers.system_tic_handler()
+    print(f"Command queue: {command_queue.get_stats()}")
     return ""
 
 
+@app.route("/cleanup", methods=["GET"])
+def cleanup():
+    handlers.cleanup_handler()
+    return ""
+
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
 @app.route(f"/command{helpers.OBFUSCATION_TOKEN}", methods=["POST"])
 def command():
-    handlers.command_handler(request)
+    received_at = time.monotonic()
+    try:
+        update = json.loads(request.data)
+    except ValueError as e:
+        print(f"Error decoding update {e}")
+        return ""
+    if isinstance(update, dict) and "update_id" in update:
+        telegram_api.note_update_received()
+        command_queue.enqueue(update, received_at)
+    return ""
+
+
+@app.route(f"{command_queue.WORKER_PATH}{helpers.OBFUSCATION_TOKEN}", methods=["POST"])
+def worker():
+    # App Engine strips this header from requests that do not come from a queue
+    if not request.headers.get("X-AppEngine-QueueName"):
+        return "", 403
+    command_queue.execute_task(json.loads(request.data))
     return ""
 
 
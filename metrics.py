@@ -0,0 +1,162 @@
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+PREFIX = "chgkbot"
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_lock = threading.Lock()
+# {(metric, labels): [bucket counts..., sum, count]}
+_histograms = {}
+_counters = {}
+_gauge_sources = {}
+_current_command = contextvars.ContextVar("current_command", default=None)
+
+
+class CommandBreakdown:
+    """Time spent in external calls while handling one command or tick."""
+
+    def __init__(self, command):
+        self.command = command
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            call = self.calls.setdefault(name, {"count": 0, "seconds": 0.0})
+            call["count"] += 1
+            call["seconds"] += seconds
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def observe(metric, seconds, **labels):
+    key = (metric, _labels_key(labels))
+    with _lock:
+        histogram = _histograms.setdefault(key, [0] * len(BUCKETS) + [0.0, 0])
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram[i] += 1
+        histogram[-2] += seconds
+        histogram[-1] += 1
+
+
+def inc(metric, value=1, **labels):
+    key = (metric, _labels_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def register_gauges(name, source):
+    """Exposes the numeric values of the dict returned by source() as gauges."""
+    _gauge_sources[name] = source
+
+
+@contextmanager
+def span(service, operation):
+    """
+    Times an external call, records it in the external_call_seconds histogram
+    and in the breakdown of the command being handled.
+    """
+    breakdown = _current_command.get()
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        inc("external_call_errors_total", service=service, operation=operation)
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        observe("external_call_seconds", seconds, service=service, operation=operation)
+        if breakdown is not None:
+            breakdown.add(f"{service}.{operation}", seconds)
+
+
+@contextmanager
+def command_span(command):
+    """
+    Times a command or tick, records it in the command_seconds histogram and
+    logs a JSON line with the time spent in each kind of external call.
+    """
+    breakdown = CommandBreakdown(command)
+    token = _current_command.set(breakdown)
+    start = time.perf_counter()
+    try:
+        yield breakdown
+    finally:
+        seconds = time.perf_counter() - start
+        _current_command.reset(token)
+        observe("command_seconds", seconds, command=command)
+        print(
+            json.dumps(
+                {
+                    "command": command,
+                    "seconds": round(seconds, 4),
+                    "calls": {
+                        name: {"count": c["count"], "seconds": round(c["seconds"], 4)}
+                        for name, c in sorted(breakdown.calls.items())
+                    },
+                },
+                ensure_ascii=False,
+            )
+        )
+
+
+def submit_in_context(executor, fn, *args):
+    """
+    ThreadPoolExecutor.submit that runs fn in a copy of the caller's context,
+    so spans in worker threads are added to the caller's command breakdown.
+    """
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(
+        f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for k, v in labels
+    ) + "}"
+
+
+def render():
+    """Returns all metrics in the Prometheus text exposition format."""
+    with _lock:
+        histograms = {k: list(v) for k, v in _histograms.items()}
+        counters = dict(_counters)
+    lines = []
+    typed = set()
+    for (metric, labels), values in sorted(histograms.items()):
+        name = f"{PREFIX}_{metric}"
+        if name not in typed:
+            lines.append(f"# TYPE {name} histogram")
+            typed.add(name)
+        for bound, count in zip(BUCKETS, values):
+            bucket_labels = labels + (("le", str(bound)),)
+            lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {count}")
+        lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {values[-1]}')
+        lines.append(f"{name}_sum{_format_labels(labels)} {values[-2]}")
+        lines.append(f"{name}_count{_format_labels(labels)} {values[-1]}")
+    for (metric, labels), value in sorted(counters.items()):
+        name = f"{PREFIX}_{metric}"
+        if name not in typed:
+            lines.append(f"# TYPE {name} counter")
+            typed.add(name)
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    for source_name, source in sorted(_gauge_sources.items()):
+        try:
+            values = source()
+        except Exception as e:
+            print(f"Error collecting {source_name} metrics {e}")
+            continue
+        for key, value in sorted(values.items()):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = f"{PREFIX}_{source_name}_{key}"
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,262 @@
+import argparse
+import datetime
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Offline stand-in for api.rating.chgk.info and the Telegram Bot API.
+# Rating API responses are replayed from a fixtures file (see save_fixtures)
+# or generated, Telegram methods get minimal successful answers. Point the bot
+# at it with RATING_API_URL and TELEGRAM_API_URL.
+
+TOURN_TYPES = ("Синхрон", "Асинхрон", "Онлайн", "Обычный")
+NAMES = ("Анна", "Мария", "Илья", "Никита", "Ольга", "Павел", "Сергей", "Дарья")
+SURNAMES = ("Иванов", "Смирнова", "Кузнецов", "Попова", "Волков", "Лебедева")
+
+
+def generate_fixtures(pages=5, venues=("3053",), requests_per_venue=40, seed=0):
+    """
+    Generates fixtures shaped like rating API responses: tournaments filling
+    about `pages` pages of 50, and accepted sync requests for each venue.
+    """
+    rnd = random.Random(seed)
+    now = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+
+    def person():
+        return {"name": rnd.choice(NAMES), "surname": rnd.choice(SURNAMES)}
+
+    tournaments = []
+    for i in range(pages * 50 - rnd.randint(1, 49)):
+        start = now - datetime.timedelta(days=rnd.randint(0, 30))
+        tournaments.append(
+            {
+                "id": 10000 + i,
+                "name": f"Турнир {i} {rnd.choice(('онлайн', 'асинхрон', 'синхрон', ''))}",
+                "type": {"name": rnd.choice(TOURN_TYPES)},
+                "dateStart": start.isoformat(),
+                "dateEnd": (start + datetime.timedelta(days=60)).isoformat(),
+                "difficultyForecast": round(rnd.uniform(1, 8), 1),
+                "maiiRating": rnd.random() < 0.7,
+                "editors": [person() for _ in range(rnd.randint(1, 4))],
+                "questionQty": {str(tour): 12 for tour in range(1, rnd.randint(2, 5))},
+            }
+        )
+
+    venue_requests = {}
+    sync_requests = {}
+    for venue_id in venues:
+        venue_requests[venue_id] = []
+        for i in range(requests_per_venue):
+            sync_req_id = f"{venue_id}{i:04d}"
+            tourn = rnd.choice(tournaments)
+            sync_req = {
+                "id": int(sync_req_id),
+                "status": "A",
+                "tournamentId": tourn["id"],
+                "representative": person(),
+                "narrator": person(),
+                "dateStart": (now + datetime.timedelta(days=rnd.randint(-90, 7))).isoformat(),
+                "issuedAt": (now - datetime.timedelta(hours=i)).isoformat(),
+            }
+            venue_requests[venue_id].append(sync_req)
+            sync_requests[sync_req_id] = sync_req
+    return {
+        "tournaments": tournaments,
+        "venue_requests": venue_requests,
+        "sync_requests": sync_requests,
+    }
+
+
+def save_fixtures(fixtures, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(fixtures, f, ensure_ascii=False)
+
+
+def load_fixtures(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, fixtures, latency=0.0, max_page_size=None):
+        super().__init__(address, StandinHandler)
+        self.fixtures = fixtures
+        self.latency = latency
+        # Like the real API, larger itemsPerPage values are capped silently
+        self.max_page_size = max_page_size
+        self.tourns_by_id = {t["id"]: t for t in fixtures["tournaments"]}
+        self.webhook_url = ""
+        self.message_id = 0
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def count(self, endpoint):
+        with self.lock:
+            self.counters[endpoint] = self.counters.get(endpoint, 0) + 1
+
+    def get_counters(self):
+        with self.lock:
+            return dict(self.counters)
+
+    def next_message_id(self):
+        with self.lock:
+            self.message_id += 1
+            return self.message_id
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _filter_dates(self, items, query):
+        # API Platform date filters, values without an offset are taken as UTC
+        def parse(value):
+            result = datetime.datetime.fromisoformat(value)
+            if result.tzinfo is None:
+                result = result.replace(tzinfo=datetime.timezone.utc)
+            return result
+
+        for param, field, keep in (
+            ("dateStart[before]", "dateStart", lambda v, b: v <= b),
+            ("dateStart[after]", "dateStart", lambda v, b: v >= b),
+            ("dateEnd[after]", "dateEnd", lambda v, b: v >= b),
+        ):
+            if param in query:
+                bound = parse(query[param][0])
+                items = [i for i in items if keep(parse(i[field]), bound)]
+        return items
+
+    def _page(self, items, query):
+        page = int(query.get("page", ["1"])[0])
+        per_page = int(query.get("itemsPerPage", ["30"])[0])
+        if self.server.max_page_size:
+            per_page = min(per_page, self.server.max_page_size)
+        return items[(page - 1) * per_page : page * per_page]
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        fixtures = self.server.fixtures
+        if url.path.startswith("/bot"):
+            return self._telegram(url.path.rsplit("/", 1)[-1], {})
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if url.path == "/tournaments":
+            self.server.count("tournaments")
+            tournaments = self._filter_dates(fixtures["tournaments"], query)
+            return self._reply(self._page(tournaments, query))
+        match = re.fullmatch(r"/tournaments/(\d+)", url.path)
+        if match:
+            self.server.count("tournament")
+            tourn = self.server.tourns_by_id.get(int(match.group(1)))
+            return self._reply(tourn or {}, 200 if tourn else 404)
+        match = re.fullmatch(r"/venues/(\w+)/requests", url.path)
+        if match:
+            self.server.count("venue_requests")
+            requests = fixtures["venue_requests"].get(match.group(1), [])
+            return self._reply(self._page(requests, query))
+        match = re.fullmatch(r"/tournament_synch_requests/(\w+)", url.path)
+        if match:
+            self.server.count("sync_request")
+            sync_req = fixtures["sync_requests"].get(match.group(1))
+            return self._reply(sync_req or {}, 200 if sync_req else 404)
+        self._reply({}, 404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        params = json.loads(self.rfile.read(length) or b"{}")
+        self._telegram(urlparse(self.path).path.rsplit("/", 1)[-1], params)
+
+    def _telegram(self, method, params):
+        self.server.count(f"telegram.{method}")
+        if method == "getWebhookInfo":
+            result = {"url": self.server.webhook_url}
+        elif method == "setWebhook":
+            self.server.webhook_url = params.get("url", "")
+            result = True
+        elif method in ("sendMessage", "sendPoll"):
+            result = {"message_id": self.server.next_message_id()}
+        elif method == "stopPoll":
+            result = {"options": [{"text": "Вариант", "voter_count": 1}]}
+        else:
+            result = True
+        self._reply({"ok": True, "result": result})
+
+
+def start_server(fixtures, latency=0.0, host="127.0.0.1", port=0, max_page_size=None):
+    """Starts the stand-in in a background thread and returns the server."""
+    server = StandinServer(
+        (host, port), fixtures, latency=latency, max_page_size=max_page_size
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Offline stand-in for the rating API and the Telegram Bot API"
+    )
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.05,
+        help="Seconds per rating API call",
+    )
+    parser.add_argument("--fixtures", type=str, help="Fixtures file to replay")
+    parser.add_argument(
+        "--max-page-size",
+        type=int,
+        help="Largest itemsPerPage the stand-in honours",
+    )
+    parser.add_argument(
+        "--pages",
+        type=int,
+        default=5,
+        help="Pages of generated tournaments",
+    )
+    parser.add_argument(
+        "--save-fixtures",
+        type=str,
+        help="Save generated fixtures and exit",
+    )
+    args = parser.parse_args()
+
+    if args.fixtures:
+        fixtures = load_fixtures(args.fixtures)
+    else:
+        fixtures = generate_fixtures(pages=args.pages)
+    if args.save_fixtures:
+        save_fixtures(fixtures, args.save_fixtures)
+        return
+    server = StandinServer(
+        ("127.0.0.1", args.port),
+        fixtures,
+        latency=args.latency,
+        max_page_size=args.max_page_size,
+    )
+    print(f"Serving on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
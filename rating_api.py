@@ -1,35 +1,121 @@
 import argparse
 import datetime
+import os
+import threading
+import time
 from dateutil.relativedelta import relativedelta
 import requests
 import helpers
 import pytz
+import rating_client
+import cache
+import datastore
 
-API_URL = "https://api.rating.chgk.info"
+API_URL = os.environ.get("RATING_API_URL", "https://api.rating.chgk.info")
 
-def get_tourn_by_id(tourn_id):
+# Name, editors and questions of a tournament practically never change once it
+# is published, while difficultyForecast and maiiRating are updated over time.
+TOURN_STATIC_TTL = 24 * 60 * 60
+TOURN_VOLATILE_TTL = 10 * 60
+TOURN_CACHE_SIZE = 2000
+
+# Synchronous and asynchronous tournaments
+TOURN_TYPES = (3, 8)
+TOURN_WINDOW_TTL = 5 * 60
+TOURN_WINDOW_CACHE_SIZE = 100
+
+_tourn_cache = cache.TTLCache(TOURN_CACHE_SIZE, TOURN_STATIC_TTL)
+_tourn_windows = cache.TTLCache(TOURN_WINDOW_CACHE_SIZE, TOURN_WINDOW_TTL)
+_tourn_cache_stats_lock = threading.Lock()
+_tourn_cache_stats = {"shared_hits": 0, "shared_misses": 0, "fetches": 0}
+# Instances that do not run the tick read the prefetched window from Datastore
+# at most this often
+PREFETCH_SHARED_CHECK_INTERVAL = 60
+
+# (first_day, last_day, fetched_at, tournaments) of the window refreshed by
+# the system tick, see prefetch_tourn_windows(). fetched_at is a Unix time,
+# the window is shared between instances.
+_prefetched_window = None
+_prefetch_checked_at = 0
+_prefetch_lock = threading.Lock()
+_prefetch_stats = {"refreshes": 0, "shared_loads": 0, "hits": 0, "misses": 0}
+
+
+def _count_tourn_cache(counter):
+    with _tourn_cache_stats_lock:
+        _tourn_cache_stats[counter] += 1
+
+
+def get_tourn_by_id(tourn_id, static_only=False):
+    """
+    Returns tournament metadata, served from the in-process cache and, if
+    SHARED_TOURN_CACHE is enabled, from the Datastore-backed cache before
+    calling the API. With static_only the caller only needs immutable fields
+    (name, editors), so entries with outdated rating fields are acceptable.
+    """
+    max_age = TOURN_STATIC_TTL if static_only else TOURN_VOLATILE_TTL
+    tourn = _tourn_cache.get(tourn_id, max_age=max_age)
+    if tourn is not None:
+        return tourn
+    if helpers.SHARED_TOURN_CACHE:
+        cached = datastore.get_cached_tourn(tourn_id)
+        if cached and time.time() - cached[1] <= max_age:
+            _count_tourn_cache("shared_hits")
+            _tourn_cache.set(tourn_id, cached[0], stored_at=cached[1])
+            return cached[0]
+        _count_tourn_cache("shared_misses")
+
+    _count_tourn_cache("fetches")
     url = f"{API_URL}/tournaments/{tourn_id}"
-    response = requests.get(url, headers={"Accept": "application/json"})
-    if not response.ok:
-        print(
-            f"Error getting tournament by id {tourn_id}, {response.status_code}, {response.reason}"
-        )
+    tourn = rating_client.get_json(url, f"Error getting tournament by id {tourn_id}")
+    if tourn is None:
         return {}
-    return response.json()
+    _tourn_cache.set(tourn_id, tourn)
+    if helpers.SHARED_TOURN_CACHE:
+        datastore.put_cached_tourn(tourn_id, tourn)
+    return tourn
+
+
+def get_tourn_cache_stats():
+    with _tourn_cache_stats_lock:
+        stats = dict(_tourn_cache_stats)
+    local_stats = _tourn_cache.stats()
+    stats.update(
+        {
+            "size": local_stats["size"],
+            "local_hits": local_stats["hits"],
+            "local_misses": local_stats["misses"],
+        }
+    )
+    return stats
+
 
+def parse_api_datetime(value, timezone="UTC"):
+    """
+    Decodes an ISO-8601 timestamp returned by the rating API and converts it
+    to the given timezone. Timestamps without an offset are taken as UTC.
+    Returns None if value is not a valid timestamp.
+    """
+    try:
+        result = datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if result.tzinfo is None:
+        result = pytz.utc.localize(result)
+    return result.astimezone(pytz.timezone(timezone))
 
-def get_tourn_by_request(request_id, chat_id):
+
+def get_tourn_by_request(request_id, timezone):
     url = f"{API_URL}/tournament_synch_requests/{request_id}"
-    response = requests.get(url, headers={"Accept": "application/json"})
-    if not response.ok:
-        print(
-            f"Error getting sync request by id {request_id}, {response.status_code}, {response.reason}"
-        )
+    result = rating_client.get_json(
+        url, f"Error getting sync request by id {request_id}"
+    )
+    if result is None:
         return None, None
-    result = response.json()
-    return result.get("tournamentId", None), helpers.parse_date(
-        result.get("issuedAt", ""), helpers.get_chat_timezone(chat_id)
-    )[0].strftime("%Y-%m-%d")
+    issued_at = parse_api_datetime(result.get("issuedAt"), timezone) or (
+        datetime.datetime.now(pytz.timezone(timezone))
+    )
+    return result.get("tournamentId", None), issued_at.strftime("%Y-%m-%d")
 
 
 def get_sync_requests_ids(venue_id, months):
@@ -40,20 +126,14 @@ def get_sync_requests_ids(venue_id, months):
     result = []
     if not venue_id:
         return result
-    for i in range(1, 30):
-        url = f"{API_URL}/venues/{venue_id}/requests?page={i}&itemsPerPage=30&dateStart%5Bafter%5D={from_date}"
-        response = requests.get(url, headers={"Accept": "application/json"})
-        if not response.ok:
-            print(
-                f"Error getting sync requests for venue {venue_id}, {response.status_code}, {response.reason}"
-            )
-            break
-        sync_requests = response.json()
-        if not sync_requests:
-            break
-        for sync_req in sync_requests:
-            if sync_req["status"] == "A":
-                result.append(str(sync_req["id"]))
+    sync_requests = rating_client.get_pages(
+        lambda i, size: f"{API_URL}/venues/{venue_id}/requests?page={i}&itemsPerPage={size}&dateStart%5Bafter%5D={from_date}",
+        rating_client.PAGE_SIZE,
+        f"Error getting sync requests for venue {venue_id}",
+    )
+    for sync_req in sync_requests:
+        if sync_req["status"] == "A":
+            result.append(str(sync_req["id"]))
 
     return result
 
@@ -67,50 +147,287 @@ def get_new_sync_requests(venue_id):
     result = []
     if not venue_id:
         return result
-    for i in range(1, 30):
-        url = f"{API_URL}/venues/{venue_id}/requests?page={i}&itemsPerPage=30&issuedAt%5Bafter%5D={from_date}&issuedAt%5Bbefore%5D={to_date}"
-        response = requests.get(url, headers={"Accept": "application/json"})
-        if not response.ok:
+    sync_requests = rating_client.get_pages(
+        lambda i, size: f"{API_URL}/venues/{venue_id}/requests?page={i}&itemsPerPage={size}&issuedAt%5Bafter%5D={from_date}&issuedAt%5Bbefore%5D={to_date}",
+        rating_client.PAGE_SIZE,
+        f"Error getting new sync requests for venue {venue_id}",
+    )
+    for sync_req in sync_requests:
+        date_start = parse_api_datetime(sync_req.get("dateStart"))
+        if date_start is None:
+            # The announcement shows the start time, so it cannot be sent
             print(
-                f"Error getting new sync requests for venue {venue_id}, {response.status_code}, {response.reason}"
+                f"Error: invalid dateStart {sync_req.get('dateStart')!r} "
+                f"in sync request {sync_req['id']}"
             )
-            break
+            continue
+
+        narrator = ""
+        if "narrator" in sync_req:
+            narrator = sync_req["narrator"]
+        elif "narrators" in sync_req:
+            narrator = sync_req["narrators"][0]
         else:
-            sync_requests = response.json()
-            if not sync_requests:
-                break
-            for sync_req in sync_requests:
-
-                narrator = ""
-                if "narrator" in sync_req:
-                    narrator = sync_req["narrator"]
-                elif "narrators" in sync_req:
-                    narrator = sync_req["narrators"][0]
-                else:
-                    print("Error: no narrators in sync request")
-                
-                result.append(
-                    {
-                        "id": str(sync_req["id"]),
-                        "tourn_id": sync_req["tournamentId"],
-                        "status": sync_req["status"],
-                        "representative": sync_req["representative"],
-                        "narrator": narrator,
-                        "dateStart": datetime.datetime.strptime(
-                            sync_req["dateStart"], "%Y-%m-%dT%H:%M:%S%z"
-                        ),
-                    }
-                )
+            print("Error: no narrators in sync request")
+        
+        result.append(
+            {
+                "id": str(sync_req["id"]),
+                "tourn_id": sync_req["tournamentId"],
+                "status": sync_req["status"],
+                "representative": sync_req["representative"],
+                "narrator": narrator,
+                "dateStart": date_start,
+            }
+        )
 
     return result
 
 
 
 
-def get_tourns(tourn_date, played_tourns, chat_id, with_time=None, only_rated=False):
+def get_tourns_window(tourn_date, with_time=None):
+    """
+    Returns the unfiltered list of tournaments available at tourn_date.
+    The list is shared between chats for TOURN_WINDOW_TTL seconds and
+    concurrent requests for the same window wait for a single API sweep.
+    Windows inside the prefetched one are filtered from it locally.
+    """
     from_date = (tourn_date - relativedelta(months=1)).strftime("%Y-%m-%d")
     print(tourn_date, from_date)
-    result = []
+    if with_time:
+        window_end = tourn_date.astimezone(pytz.utc)
+    else:
+        window_end = _day_end(tourn_date)
+    prefetched = _get_prefetched(
+        _to_date(tourn_date - relativedelta(months=1)), window_end, window_end
+    )
+    if prefetched is not None:
+        return prefetched
+    if with_time:
+        to_date = requests.utils.quote(
+            tourn_date.astimezone(pytz.utc).strftime(
+                "%Y-%m-%d %H:%M"
+            )
+        )
+        date_filter = f"dateStart%5Bbefore%5D={to_date}&dateStart%5Bafter%5D={from_date}&dateEnd%5Bafter%5D={to_date}"
+    else:
+        to_date = tourn_date.strftime("%Y-%m-%d")
+        date_filter = f"dateStart%5Bbefore%5D={to_date}%2023%3A59&dateStart%5Bafter%5D={from_date}&dateEnd%5Bafter%5D={to_date}%2023%3A59"
+    return _get_window(date_filter)
+
+
+def get_tourns_range_window(first_day, last_day):
+    """
+    Returns the unfiltered list of tournaments available on any day from
+    first_day to last_day, fetched with one API sweep.
+    """
+    prefetched = _get_prefetched(
+        first_day - relativedelta(months=1), _day_end(last_day), _day_end(first_day)
+    )
+    if prefetched is not None:
+        return prefetched
+    from_date = (first_day - relativedelta(months=1)).strftime("%Y-%m-%d")
+    first_date = first_day.strftime("%Y-%m-%d")
+    last_date = last_day.strftime("%Y-%m-%d")
+    date_filter = f"dateStart%5Bbefore%5D={last_date}%2023%3A59&dateStart%5Bafter%5D={from_date}&dateEnd%5Bafter%5D={first_date}%2023%3A59"
+    return _get_window(date_filter)
+
+
+def _to_date(value):
+    return datetime.date(value.year, value.month, value.day)
+
+
+def _day_start(day):
+    return pytz.utc.localize(datetime.datetime.combine(_to_date(day), datetime.time()))
+
+
+def _day_end(day):
+    return pytz.utc.localize(
+        datetime.datetime.combine(_to_date(day), datetime.time(23, 59))
+    )
+
+
+def _in_window(tourn, from_day, start_before, end_after):
+    """
+    Local version of the API window filter: dateStart after from_day and
+    before start_before, dateEnd after end_after.
+    """
+    date_start = parse_api_datetime(tourn.get("dateStart"))
+    date_end = parse_api_datetime(tourn.get("dateEnd"))
+    if not date_start or not date_end:
+        return False
+    return _day_start(from_day) <= date_start <= start_before and date_end >= end_after
+
+
+def is_available_on(tourn, day):
+    """Whether tourn is in the window get_tourns_window() returns for day."""
+    return _in_window(
+        tourn, day - relativedelta(months=1), _day_end(day), _day_end(day)
+    )
+
+
+def _fetch_window(date_filter):
+    type_filter = "".join(f"&type%5B%5D={tourn_type}" for tourn_type in TOURN_TYPES)
+    page_url = lambda i, size: f"{API_URL}/tournaments?page={i}&itemsPerPage={size}&{date_filter}{type_filter}"
+    print(page_url(1, rating_client.PAGE_SIZE))
+    return rating_client.get_pages(
+        page_url, rating_client.PAGE_SIZE, "Error in get_tourns"
+    )
+
+
+def _get_window(date_filter):
+    return (
+        _tourn_windows.get_or_load(
+            (date_filter, TOURN_TYPES), lambda: _fetch_window(date_filter)
+        )
+        or []
+    )
+
+
+def _get_prefetched(from_day, start_before, end_after):
+    """
+    Returns the tournaments of a window filtered out of the prefetched one,
+    or None if prefetching is off, the prefetched window is older than two
+    refresh intervals or does not cover the requested one.
+    """
+    if helpers.TOURN_PREFETCH_DAYS <= 0:
+        return None
+    prefetched = _get_prefetched_window()
+    covered = (
+        prefetched is not None
+        and time.time() - prefetched[2] <= 2 * helpers.TOURN_PREFETCH_INTERVAL
+        and _to_date(from_day) >= prefetched[0] - relativedelta(months=1)
+        and start_before <= _day_end(prefetched[1])
+        and end_after >= _day_start(prefetched[0])
+    )
+    with _tourn_cache_stats_lock:
+        _prefetch_stats["hits" if covered else "misses"] += 1
+    if not covered:
+        return None
+    return [
+        tourn
+        for tourn in prefetched[3]
+        if _in_window(tourn, from_day, start_before, end_after)
+    ]
+
+
+def _get_prefetched_window():
+    """
+    Returns the prefetched window of this instance. Once it is older than
+    TOURN_PREFETCH_INTERVAL, it is replaced with a newer one stored in
+    Datastore by the instance that ran the tick.
+    """
+    global _prefetched_window, _prefetch_checked_at
+    prefetched = _prefetched_window
+    now = time.time()
+    if prefetched is not None and now - prefetched[2] < helpers.TOURN_PREFETCH_INTERVAL:
+        return prefetched
+    with _tourn_cache_stats_lock:
+        if now - _prefetch_checked_at < PREFETCH_SHARED_CHECK_INTERVAL:
+            return prefetched
+        _prefetch_checked_at = now
+    shared = datastore.get_prefetched_tourns()
+    if shared is not None and (prefetched is None or shared[2] > prefetched[2]):
+        _prefetched_window = prefetched = shared
+        with _tourn_cache_stats_lock:
+            _prefetch_stats["shared_loads"] += 1
+    return prefetched
+
+
+def prefetch_tourn_windows():
+    """
+    Refreshes the prefetched window of tournaments available from yesterday
+    to TOURN_PREFETCH_DAYS days ahead if it is older than
+    TOURN_PREFETCH_INTERVAL and stores it in Datastore for the other
+    instances. /tourns for a date or range inside it is filtered from it
+    locally. Returns True if the window was refreshed.
+    """
+    global _prefetched_window
+    if helpers.TOURN_PREFETCH_DAYS <= 0:
+        return False
+    today = datetime.datetime.now(pytz.utc).date()
+    # Yesterday in UTC may still be today in the chat's timezone
+    first_day = today - datetime.timedelta(days=1)
+    last_day = today + datetime.timedelta(days=helpers.TOURN_PREFETCH_DAYS)
+    prefetched = _get_prefetched_window()
+    if (
+        prefetched is not None
+        and prefetched[0] == first_day
+        and time.time() - prefetched[2] < helpers.TOURN_PREFETCH_INTERVAL
+    ):
+        return False
+    if not _prefetch_lock.acquire(blocking=False):
+        return False
+    try:
+        from_date = (first_day - relativedelta(months=1)).strftime("%Y-%m-%d")
+        date_filter = f"dateStart%5Bbefore%5D={last_day.strftime('%Y-%m-%d')}%2023%3A59&dateStart%5Bafter%5D={from_date}&dateEnd%5Bafter%5D={first_day.strftime('%Y-%m-%d')}"
+        fetched_at = time.time()
+        tournaments = _fetch_window(date_filter)
+        if not tournaments:
+            return False
+        _prefetched_window = (first_day, last_day, fetched_at, tournaments)
+        datastore.put_prefetched_tourns(first_day, last_day, fetched_at, tournaments)
+        with _tourn_cache_stats_lock:
+            _prefetch_stats["refreshes"] += 1
+        return True
+    finally:
+        _prefetch_lock.release()
+
+
+def get_prefetch_stats():
+    """Counters of the prefetched window, hit_rate is the share of served windows."""
+    with _tourn_cache_stats_lock:
+        stats = dict(_prefetch_stats)
+    requests_count = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / requests_count if requests_count else 0.0
+    prefetched = _prefetched_window
+    stats["size"] = len(prefetched[3]) if prefetched else 0
+    stats["age"] = time.time() - prefetched[2] if prefetched else 0
+    return stats
+
+
+def get_tourns(
+    tourn_date, played_tourns, chat_context, with_time=None, only_rated=False
+):
+    tournaments = get_tourns_window(tourn_date, with_time=with_time)
+    return [
+        entry
+        for _, entry in _filter_tourns(
+            tournaments, played_tourns, chat_context, only_rated
+        )
+    ]
+
+
+def get_tourns_range(
+    first_day, last_day, played_tourns, chat_context, only_rated=False
+):
+    """
+    Returns tournaments available from first_day to last_day grouped by the
+    days they are available on, as [(days, tourns)]. Tournaments available
+    on all days come first, the other groups are ordered by their days.
+    """
+    days = [
+        first_day + datetime.timedelta(days=i)
+        for i in range((last_day - first_day).days + 1)
+    ]
+    tournaments = get_tourns_range_window(first_day, last_day)
+    groups = {}
+    for tourn, entry in _filter_tourns(
+        tournaments, played_tourns, chat_context, only_rated
+    ):
+        tourn_days = tuple(day for day in days if is_available_on(tourn, day))
+        if tourn_days:
+            groups.setdefault(tourn_days, []).append(entry)
+    return sorted(groups.items(), key=lambda g: (len(g[0]) != len(days), g[0]))
+
+
+def _filter_tourns(tournaments, played_tourns, chat_context, only_rated):
+    """
+    Yields (tourn, entry) for the tournaments of an API window the chat can
+    play: matching its difficulty and rating settings and not yet played at
+    its venues, entry is the summary used for the /tourns list.
+    """
     played_tourns_ids = played_tourns.keys()
     played_syncs = {}
     for tourn_id in played_tourns_ids:
@@ -119,98 +436,75 @@ def get_tourns(tourn_date, played_tourns, chat_id, with_time=None, only_rated=Fa
             "date": played_tourns[tourn_id][2],
         }
     # print(played_syncs)
-    for i in range(1, 30):
-        if with_time:
-            to_date = requests.utils.quote(
-                tourn_date.astimezone(pytz.utc).strftime(
-                    "%Y-%m-%d %H:%M"
-                )
+    for tourn in tournaments:
+        # print(tourn)
+        if (
+            "difficultyForecast" in tourn
+            and tourn["difficultyForecast"]
+            and (
+                tourn["difficultyForecast"] < chat_context.min_difficulty
+                or tourn["difficultyForecast"] > chat_context.max_difficulty
             )
-            url = f"{API_URL}/tournaments?page={i}&itemsPerPage=50&dateStart%5Bbefore%5D={to_date}&dateStart%5Bafter%5D={from_date}&dateEnd%5Bafter%5D={to_date}&type%5B%5D=3&type%5B%5D=8"
-        else:
-            to_date = tourn_date.strftime("%Y-%m-%d")
-            url = f"{API_URL}/tournaments?page={i}&itemsPerPage=50&dateStart%5Bbefore%5D={to_date}%2023%3A59&dateStart%5Bafter%5D={from_date}&dateEnd%5Bafter%5D={to_date}%2023%3A59&type%5B%5D=3&type%5B%5D=8"
-        print(url)
-        response = requests.get(url, headers={"Accept": "application/json"})
-        tournaments = response.json()
-        # print(tournaments)
-        if not response.ok:
-            print(f"Error in get_tourns {response.status_code}, {response.reason}")
-            break
-        if not tournaments:
-            break
-        for tourn in tournaments:
-            # print(tourn)
-            if (
-                "difficultyForecast" in tourn
-                and tourn["difficultyForecast"]
-                and (
-                    tourn["difficultyForecast"] < helpers.get_chat_min_difficulty(chat_id)
-                    or tourn["difficultyForecast"] > helpers.get_chat_max_difficulty(chat_id)
+            or only_rated
+            and ("maiiRating" not in tourn or not tourn["maiiRating"])
+        ):
+            continue
+        if (
+            "type" not in tourn
+            or "name" not in tourn["type"]
+            or tourn["type"]["name"] == "Обычный"
+        ):
+            continue
+        if "id" not in tourn or tourn["id"] in played_tourns_ids:
+            continue
+        tourn_editors = (
+            ", ".join(
+                sorted(
+                    [
+                        editor["name"][:1] + ". " + editor["surname"]
+                        for editor in tourn["editors"]
+                    ]
                 )
-                or only_rated
-                and ("maiiRating" not in tourn or not tourn["maiiRating"])
-            ):
-                continue
+            )
+            if "editors" in tourn
+            else ""
+        )
+        if tourn["type"]["name"] in ("Асинхрон", "Онлайн"):
+            norm_name = helpers.normalize_tourn_name(tourn["name"])
+            async_start_date = parse_api_datetime(
+                tourn.get("dateStart"), chat_context.timezone
+            ) or datetime.datetime.now(pytz.timezone(chat_context.timezone))
+            sync_from_date = (async_start_date - relativedelta(months=1)).strftime(
+                "%Y-%m-%d"
+            )
+            # print(
+            #     norm_name,
+            #     tourn_editors,
+            #     sync_from_date,
+            # )
             if (
-                "type" not in tourn
-                or "name" not in tourn["type"]
-                or tourn["type"]["name"] == "Обычный"
+                norm_name in played_syncs
+                and tourn_editors == played_syncs[norm_name]["editors"]
+                and sync_from_date < played_syncs[norm_name]["date"]
             ):
                 continue
-            if "id" not in tourn or tourn["id"] in played_tourns_ids:
-                continue
-            tourn_editors = (
-                ", ".join(
-                    sorted(
-                        [
-                            editor["name"][:1] + ". " + editor["surname"]
-                            for editor in tourn["editors"]
-                        ]
-                    )
-                )
-                if "editors" in tourn
-                else ""
-            )
-            if tourn["type"]["name"] in ("Асинхрон", "Онлайн"):
-                norm_name = helpers.normalize_tourn_name(tourn["name"])
-                async_start_date, _ = helpers.parse_date(
-                    tourn["dateStart"], helpers.get_chat_timezone(chat_id)
-                )
-                sync_from_date = (async_start_date - relativedelta(months=1)).strftime(
-                    "%Y-%m-%d"
-                )
-                # print(
-                #     norm_name,
-                #     tourn_editors,
-                #     sync_from_date,
-                # )
-                if (
-                    norm_name in played_syncs
-                    and tourn_editors == played_syncs[norm_name]["editors"]
-                    and sync_from_date < played_syncs[norm_name]["date"]
-                ):
-                    continue
-            tourn_questions = 0
-            if "questionQty" in tourn:
-                for n_tour in tourn["questionQty"]:
-                    tourn_questions += tourn["questionQty"][n_tour]
-            difficulty = (
-                tourn["difficultyForecast"]
-                if "difficultyForecast" in tourn and tourn["difficultyForecast"]
-                else 0
-            )
-            result.append(
-                {
-                    "id": tourn["id"],
-                    "name": tourn["name"],
-                    "num_questions": tourn_questions,
-                    "rating": tourn["maiiRating"],
-                    "difficulty": difficulty,
-                    "editors": tourn_editors,
-                }
-            )
-    return result
+        tourn_questions = 0
+        if "questionQty" in tourn:
+            for n_tour in tourn["questionQty"]:
+                tourn_questions += tourn["questionQty"][n_tour]
+        difficulty = (
+            tourn["difficultyForecast"]
+            if "difficultyForecast" in tourn and tourn["difficultyForecast"]
+            else 0
+        )
+        yield tourn, {
+            "id": tourn["id"],
+            "name": tourn["name"],
+            "num_questions": tourn_questions,
+            "rating": tourn["maiiRating"],
+            "difficulty": difficulty,
+            "editors": tourn_editors,
+        }
 
 
 def main():
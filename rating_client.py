@@ -0,0 +1,240 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import metrics
+
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+POOL_SIZE = 10
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_PAGES = 29
+PAGE_CONCURRENCY = 4
+# Preferred page size, lowered per endpoint if the API returns less
+PAGE_SIZE = 100
+
+_session = None
+_session_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "errors": 0, "paged_calls": 0, "pages": 0, "truncated": 0}
+# Page size each paginated endpoint is known to return in full
+_page_size_limits = {}
+# Size of the largest short page that ended a sweep of each endpoint. The API
+# does not cap its pages below it, pages of up to this size are the last ones.
+_page_size_floors = {}
+
+
+def get_session():
+    """
+    Returns the process-wide session used for all rating API calls.
+    Connections are pooled and kept alive between calls, idempotent GETs
+    are retried with exponential backoff on connection errors and 429/5xx.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=MAX_RETRIES,
+                    backoff_factor=BACKOFF_FACTOR,
+                    status_forcelist=RETRY_STATUSES,
+                    allowed_methods=("GET",),
+                    respect_retry_after_header=True,
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=POOL_SIZE,
+                    pool_maxsize=POOL_SIZE,
+                    max_retries=retry,
+                )
+                session = requests.Session()
+                session.headers.update({"Accept": "application/json"})
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def get_operation(url):
+    """Endpoint of a rating API url with ids replaced, e.g. tournaments/{id}."""
+    return "/".join(
+        "{id}" if segment.isdigit() else segment
+        for segment in urlparse(url).path.strip("/").split("/")
+    )
+
+
+def get(url, timeout=None):
+    """
+    Performs a GET request through the shared session.
+    Returns the response, or None if the request could not be completed.
+    """
+    with _stats_lock:
+        _stats["requests"] += 1
+    operation = get_operation(url)
+    try:
+        with metrics.span("rating_api", operation):
+            response = get_session().get(
+                url, timeout=timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+            )
+    except requests.RequestException as e:
+        with _stats_lock:
+            _stats["errors"] += 1
+        print(f"Error requesting {url}: {e}")
+        return None
+    if response.status_code >= 500:
+        metrics.inc("external_call_errors_total", service="rating_api", operation=operation)
+    return response
+
+
+def get_json(url, error_message, timeout=None):
+    """
+    Performs a GET request and returns the decoded JSON body.
+    Returns None and prints error_message if the request failed.
+    """
+    response = get(url, timeout=timeout)
+    if response is None:
+        print(error_message)
+        return None
+    if not response.ok:
+        print(f"{error_message}, {response.status_code}, {response.reason}")
+        return None
+    try:
+        return response.json()
+    except ValueError:
+        print(f"{error_message}, invalid JSON")
+        return None
+
+
+def get_connection_stats():
+    """
+    Returns request and connection counters of the shared session.
+    reuse_rate is the share of requests served over an already open connection.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    connections = 0
+    pool_requests = 0
+    if _session is not None:
+        pools = _session.get_adapter("https://").poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            if pool is None:
+                continue
+            connections += pool.num_connections
+            pool_requests += pool.num_requests
+    stats["connections"] = connections
+    stats["reuse_rate"] = (
+        1 - connections / pool_requests if pool_requests else 0.0
+    )
+    return stats
+
+
+def log_connection_stats():
+    stats = get_connection_stats()
+    print(
+        f"Rating API: {stats['requests']} requests, {stats['errors']} errors, "
+        f"{stats['connections']} connections, reuse rate {stats['reuse_rate']:.2f}, "
+        f"{stats['pages']} pages in {stats['paged_calls']} paged calls"
+    )
+
+
+def get_pages(
+    page_url, page_size, error_message, max_pages=MAX_PAGES, concurrency=PAGE_CONCURRENCY
+):
+    """
+    Fetches a paginated endpoint, page_url(page, page_size) builds the url of
+    a page. The first empty, short or failed page ends the sweep, so results
+    that fit into one page cost one request. Later pages are requested
+    concurrently in windows of `concurrency` pages, pages after the last one
+    are cancelled or discarded. Returns items of all pages in page order.
+
+    If the API caps the page size below page_size (a short page followed by
+    a non-empty one), the cap is remembered for the endpoint. A short page
+    the endpoint is not known to end on is followed by a request of the next
+    page, on the first sweep page 2 is requested together with page 1. A
+    short page followed by an empty one shows the API does not cap pages
+    below its size, later sweeps end on pages up to that size right away. Warns if
+    max_pages pages were not enough.
+    """
+    endpoint = get_operation(page_url(1, page_size))
+    known_page_size = _page_size_limits.get(endpoint)
+    if known_page_size:
+        page_size = min(page_size, known_page_size)
+    window = 1 if known_page_size or endpoint in _page_size_floors else 2
+    result = []
+    requests_made = 0
+    complete = False
+    # Size of a short page that may be either the last one or a capped one
+    short_page = None
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        page = 1
+        while page <= max_pages and not complete:
+            futures = [
+                metrics.submit_in_context(
+                    executor,
+                    get_json,
+                    page_url(p, page_size),
+                    f"{error_message}, page {p}",
+                )
+                for p in range(page, min(page + window, max_pages + 1))
+            ]
+            requests_made += len(futures)
+            for future in futures:
+                if complete:
+                    if future.cancel():
+                        requests_made -= 1
+                    continue
+                items = future.result()
+                if short_page is not None:
+                    if not items:
+                        _page_size_floors[endpoint] = max(
+                            _page_size_floors.get(endpoint, 0), short_page
+                        )
+                        complete = True
+                        continue
+                    # Pages are numbered by the size the API actually
+                    # returns, the sweep can go on with it
+                    page_size = short_page
+                    _page_size_limits[endpoint] = page_size
+                    print(f"Rating API returns {page_size} items per page of {endpoint}")
+                    short_page = None
+                if items:
+                    result.extend(items)
+                if not items:
+                    complete = True
+                elif len(items) == page_size:
+                    _page_size_limits.setdefault(endpoint, page_size)
+                elif (
+                    _page_size_limits.get(endpoint, 0) >= page_size
+                    or len(items) <= _page_size_floors.get(endpoint, 0)
+                ):
+                    complete = True
+                else:
+                    short_page = len(items)
+            page += len(futures)
+            # A short page is checked with a single request of the next one
+            window = 1 if short_page is not None else concurrency
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    if short_page is not None:
+        # max_pages was reached right after a short page, it is taken as the last
+        complete = True
+
+    with _stats_lock:
+        _stats["paged_calls"] += 1
+        _stats["pages"] += requests_made
+        if not complete:
+            _stats["truncated"] += 1
+    metrics.inc("rating_api_paged_calls_total", operation=endpoint)
+    metrics.inc("rating_api_pages_total", requests_made, operation=endpoint)
+    if not complete:
+        print(
+            f"Warning: {endpoint} has more than {max_pages} pages of {page_size}, "
+            f"the result is truncated to {len(result)} items"
+        )
+    return result
@@ -0,0 +1,55 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+# Cumulative import time of main.py in milliseconds. Measured at about 250 ms
+# after the heavy dependencies were made lazy (960 ms before), the budget leaves
+# room for slower machines but fails if an eager heavy import comes back.
+IMPORT_TIME_BUDGET_MS = 500
+RUNS = 5
+
+
+def measure_import_time():
+    env = dict(os.environ)
+    for var in ("PROJECT_ID", "TELEGRAM_API_TOKEN", "OBFUSCATION_TOKEN"):
+        env.setdefault(var, "startup-budget")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imports = {}
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)", line)
+        if match:
+            imports[match.group(4)] = int(match.group(2)) / 1000
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Checks that importing main.py fits into the import time budget"
+    )
+    parser.add_argument("--budget", type=float, default=IMPORT_TIME_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to show")
+    args = parser.parse_args()
+
+    # The fastest of several runs, the first one also pays for cold disk caches
+    runs = [measure_import_time() for _ in range(RUNS)]
+    imports = min(runs, key=lambda r: r["main"])
+    total = imports["main"]
+    for name, ms in sorted(imports.items(), key=lambda i: -i[1])[1 : args.top + 1]:
+        print(f"{ms:8.1f} ms  {name}")
+    print(f"main: {total:.1f} ms, budget {args.budget:.1f} ms")
+    if total > args.budget:
+        print("Import time budget exceeded")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import hashlib
+import json
+import zlib
+
+# Version 1 blob: one version byte followed by zlib-compressed JSON. Records
+# are stored as [fields, interned, strings, rows], each row holds the values
+# of `fields` in order, values of the `interned` fields are indexes into
+# `strings`. encode_json() stores any JSON value as it is.
+FORMAT_VERSION = 1
+
+CHAT_DATA_FIELDS = ("id", "name")
+PLAYED_TOURNS_FIELDS = ("sync_req_id", "tourn_id", "norm_name", "editors", "date")
+# Editors and dates repeat across tournaments of a venue
+PLAYED_TOURNS_INTERNED = ("editors", "date")
+
+
+def encode_records(records, fields, interned=()):
+    """
+    Packs a list of dicts with the given fields into a compact blob.
+    Returns the blob and a hash of the content, equal for equal lists.
+    """
+    interned = [field for field in fields if field in interned]
+    strings = []
+    string_ids = {}
+    rows = []
+    for record in records:
+        row = []
+        for field in fields:
+            value = record.get(field)
+            if field in interned:
+                if value not in string_ids:
+                    string_ids[value] = len(strings)
+                    strings.append(value)
+                value = string_ids[value]
+            row.append(value)
+        rows.append(row)
+    payload = _dump([list(fields), interned, strings, rows])
+    content_hash = hashlib.sha1(payload).hexdigest()
+    return _pack(payload), content_hash
+
+
+def decode_records(value):
+    """
+    Unpacks a blob written by encode_records(). Lists of dicts stored by
+    earlier versions are returned as they are.
+    """
+    if not value:
+        return []
+    if not isinstance(value, bytes):
+        return list(value)
+    fields, interned, strings, rows = _unpack(value)
+    records = []
+    for row in rows:
+        record = dict(zip(fields, row))
+        for field in interned:
+            record[field] = strings[record[field]]
+        records.append(record)
+    return records
+
+
+def encode_json(value):
+    """Packs a JSON-serializable value into a blob."""
+    return _pack(_dump(value))
+
+
+def decode_json(value):
+    """Unpacks a blob written by encode_json()."""
+    return _unpack(value)
+
+
+def _dump(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _pack(payload):
+    return bytes([FORMAT_VERSION]) + zlib.compress(payload, 9)
+
+
+def _unpack(value):
+    if value[0] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported encoding version {value[0]}")
+    return json.loads(zlib.decompress(value[1:]).decode("utf-8"))
@@ -1,34 +1,76 @@
-import requests
-from telegram import ParseMode
+import os
 import random
+import threading
+import time
 import helpers
+import telegram_dispatcher
 
 
-BASE_URL = "https://api.telegram.org/bot" + helpers.TELEGRAM_API_TOKEN + "/"
+API_URL = os.environ.get("TELEGRAM_API_URL", "https://api.telegram.org")
+BASE_URL = API_URL + "/bot" + helpers.TELEGRAM_API_TOKEN + "/"
 HOOK_URL = (
     f"https://{helpers.PROJECT_ID}.appspot.com/command{helpers.OBFUSCATION_TOKEN}"
 )
 MAX_MESSAGE_SIZE = 4000
 
+_webhook_lock = threading.Lock()
+_webhook_checked_at = None
+_last_update_at = None
+
 
 def set_webhook():
     resp = get_webhook()
     # print(resp)
+    if not resp.ok:
+        # Registering again would drop pending updates, the check is retried
+        # on the next tick instead
+        print(f"Error getting webhook info {resp.status_code}, {resp.reason}")
+        return False
+    webhook_info = resp.json()
     if (
-        "result" not in resp
-        or "url" not in resp["result"]
-        or resp["result"]["url"] != HOOK_URL
+        "result" not in webhook_info
+        or "url" not in webhook_info["result"]
+        or webhook_info["result"]["url"] != HOOK_URL
     ):
-        response = requests.post(
+        response = telegram_dispatcher.call(
             BASE_URL + "setWebhook",
-            json={"url": HOOK_URL, "drop_pending_updates": True},
+            {"url": HOOK_URL, "drop_pending_updates": True},
         )
         if not response.ok:
             print(f"Error setting webhook {response.status_code}, {response.reason}")
+            return False
+    return True
+
+
+def note_update_received():
+    global _last_update_at
+    _last_update_at = time.monotonic()
+
+
+def ensure_webhook():
+    """
+    Verifies the webhook registration on the first call in the instance and
+    then only every WEBHOOK_CHECK_INTERVAL seconds, or when no update has
+    arrived for WEBHOOK_DELIVERY_GAP seconds since the last check.
+    """
+    global _webhook_checked_at
+    now = time.monotonic()
+    with _webhook_lock:
+        if _webhook_checked_at is not None:
+            last_activity = max(_webhook_checked_at, _last_update_at or 0)
+            if (
+                now - _webhook_checked_at < helpers.WEBHOOK_CHECK_INTERVAL
+                and now - last_activity < helpers.WEBHOOK_DELIVERY_GAP
+            ):
+                return
+        if set_webhook():
+            _webhook_checked_at = now
 
 
 def get_webhook():
-    return requests.get(BASE_URL + "getWebhookInfo")
+    return telegram_dispatcher.call(
+        BASE_URL + "getWebhookInfo", None, http_method="GET"
+    )
 
 
 def send_message(
@@ -40,15 +82,14 @@ def send_message(
         "disable_web_page_preview": True,
     }
     if formatted:
-        params["parse_mode"] = ParseMode.HTML
+        params["parse_mode"] = "HTML"
     if message_thread_id:
         params["message_thread_id"] = message_thread_id
     if reply_to_message_id:
         params["reply_to_message_id"] = reply_to_message_id
     # print(len(params["text"]))
-    response = requests.post(
-        BASE_URL + "sendMessage",
-        json=params,
+    response = telegram_dispatcher.call(
+        BASE_URL + "sendMessage", params, chat_id
     )
     if not response.ok:
         print(f"Error sending message {response.status_code}, {response.reason}")
@@ -87,9 +128,8 @@ def pin_message(chat_id, message_thread_id, message_id):
     params = {"chat_id": str(chat_id), "message_id": str(message_id)}
     if message_thread_id:
         params["message_thread_id"] = message_thread_id
-    response = requests.post(
-        BASE_URL + "pinChatMessage",
-        json=params,
+    response = telegram_dispatcher.call(
+        BASE_URL + "pinChatMessage", params, chat_id
     )
     if not response.ok:
         print(f"Error pinning message {response.status_code}, {response.reason}")
@@ -100,9 +140,8 @@ def unpin_message(chat_id, message_thread_id, message_id):
     params = {"chat_id": str(chat_id), "message_id": str(message_id)}
     if message_thread_id:
         params["message_thread_id"] = message_thread_id
-    response = requests.post(
-        BASE_URL + "unpinChatMessage",
-        json=params,
+    response = telegram_dispatcher.call(
+        BASE_URL + "unpinChatMessage", params, chat_id
     )
     if not response.ok:
         print(f"Error unpinning message {response.status_code}, {response.reason}")
@@ -120,9 +159,8 @@ def create_game_poll(chat_id, message_thread_id, title, chosen_tourns):
     }
     if message_thread_id:
         params["message_thread_id"] = message_thread_id
-    response = requests.post(
-        BASE_URL + "sendPoll",
-        json=params,
+    response = telegram_dispatcher.call(
+        BASE_URL + "sendPoll", params, chat_id
     )
     if not response.ok:
         print(f"Error creating poll {response.status_code}, {response.reason}")
@@ -151,9 +189,8 @@ def create_feedback_poll(chat_id, message_thread_id):
     }
     if message_thread_id:
         params["message_thread_id"] = message_thread_id
-    response = requests.post(
-        BASE_URL + "sendPoll",
-        json=params,
+    response = telegram_dispatcher.call(
+        BASE_URL + "sendPoll", params, chat_id
     )
     if not response.ok:
         print(f"Error creating poll {response.status_code}, {response.reason}")
@@ -164,7 +201,7 @@ def stop_poll(chat_id, message_thread_id, message_id):
     params = {"chat_id": str(chat_id), "message_id": message_id}
     if message_thread_id:
         params["message_thread_id"] = message_thread_id
-    response = requests.post(BASE_URL + "stopPoll", json=params)
+    response = telegram_dispatcher.call(BASE_URL + "stopPoll", params, chat_id)
     if not response.ok:
         print(f"Error stopping poll {response.status_code}, {response.reason}")
     return response
@@ -0,0 +1,170 @@
+import threading
+import time
+import requests
+import cache
+import metrics
+
+# Telegram allows about 30 messages per second overall, one message per
+# second in a private chat and 20 messages per minute in a group.
+GLOBAL_RATE = 30
+PRIVATE_CHAT_RATE = 1
+GROUP_CHAT_RATE = 20 / 60
+CHAT_BURST = 3
+# An idle bucket refills in CHAT_BURST / GROUP_CHAT_RATE = 9 s, one unused
+# for a minute is as good as a new one and is dropped.
+CHAT_BUCKETS_SIZE = 10000
+CHAT_BUCKET_IDLE_TTL = 60
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5
+MAX_RETRY_AFTER = 30
+TIMEOUT = (3.05, 15)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. reserve() takes a token and returns how long
+    the caller has to wait before using it, so concurrent callers are spaced
+    out instead of racing.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens -= 1
+            wait = max(0, -self.tokens / self.rate)
+            return max(wait, self.blocked_until - now)
+
+    def block(self, seconds):
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+_session = requests.Session()
+_global_bucket = TokenBucket(GLOBAL_RATE, GLOBAL_RATE)
+_chat_buckets = cache.TTLCache(CHAT_BUCKETS_SIZE, CHAT_BUCKET_IDLE_TTL)
+_lock = threading.Lock()
+_stats = {
+    # Calls waiting for a rate limit or for Telegram's response
+    "in_flight": 0,
+    "calls": 0,
+    "retries": 0,
+    "failures": 0,
+    "latency_total": 0.0,
+    "latency_max": 0.0,
+}
+
+
+def _get_chat_bucket(chat_id):
+    with _lock:
+        bucket = _chat_buckets.get(chat_id)
+        if bucket is None:
+            rate = GROUP_CHAT_RATE if int(chat_id) < 0 else PRIVATE_CHAT_RATE
+            bucket = TokenBucket(rate, CHAT_BURST)
+        # Stored again on every use, so only idle buckets expire
+        _chat_buckets.set(chat_id, bucket)
+        return bucket
+
+
+def _update_stats(**deltas):
+    with _lock:
+        for k, v in deltas.items():
+            _stats[k] += v
+
+
+def _get_retry_after(response):
+    try:
+        retry_after = response.json().get("parameters", {}).get("retry_after")
+    except ValueError:
+        retry_after = None
+    if retry_after is None:
+        retry_after = response.headers.get("Retry-After", 1)
+    return min(float(retry_after), MAX_RETRY_AFTER)
+
+
+def _send(url, params, chat_id, http_method):
+    method = url.rsplit("/", 1)[-1]
+    with metrics.span("telegram", method):
+        response = _send_with_retries(url, params, chat_id, http_method)
+    if not response.ok:
+        metrics.inc("external_call_errors_total", service="telegram", operation=method)
+    return response
+
+
+def _send_with_retries(url, params, chat_id, http_method):
+    chat_bucket = _get_chat_bucket(str(chat_id)) if chat_id is not None else None
+    start = time.monotonic()
+    try:
+        for attempt in range(MAX_RETRIES + 1):
+            delay = _global_bucket.reserve()
+            if chat_bucket:
+                delay = max(delay, chat_bucket.reserve())
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                if http_method == "GET":
+                    response = _session.get(url, params=params, timeout=TIMEOUT)
+                else:
+                    response = _session.post(url, json=params, timeout=TIMEOUT)
+            except requests.RequestException as e:
+                if attempt == MAX_RETRIES:
+                    _update_stats(failures=1)
+                    raise
+                print(f"Error calling Telegram {e}, retrying")
+                _update_stats(retries=1)
+                time.sleep(BACKOFF_FACTOR * 2**attempt)
+                continue
+
+            if response.status_code == 429 and attempt < MAX_RETRIES:
+                retry_after = _get_retry_after(response)
+                print(
+                    f"Telegram rate limit hit for chat {chat_id}, retry after {retry_after}s"
+                )
+                (chat_bucket or _global_bucket).block(retry_after)
+                _update_stats(retries=1)
+                continue
+            if response.status_code >= 500 and attempt < MAX_RETRIES:
+                _update_stats(retries=1)
+                time.sleep(BACKOFF_FACTOR * 2**attempt)
+                continue
+            if not response.ok:
+                _update_stats(failures=1)
+            return response
+    finally:
+        latency = time.monotonic() - start
+        with _lock:
+            _stats["in_flight"] -= 1
+            _stats["calls"] += 1
+            _stats["latency_total"] += latency
+            _stats["latency_max"] = max(_stats["latency_max"], latency)
+
+
+def call(url, params, chat_id=None, http_method="POST"):
+    """
+    Makes a Telegram Bot API call and returns the response. The call waits
+    for the global and per-chat rate limits and is retried on 429 (after the
+    delay given by Telegram) and on 5xx.
+    """
+    _update_stats(in_flight=1)
+    return _send(url, params, chat_id, http_method)
+
+
+def get_stats():
+    with _lock:
+        stats = dict(_stats)
+    stats["latency_avg"] = (
+        stats["latency_total"] / stats["calls"] if stats["calls"] else 0.0
+    )
+    del stats["latency_total"]
+    return stats
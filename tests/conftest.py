@@ -0,0 +1,62 @@
+import contextlib
+import os
+import sys
+import pytest
+
+# The bot modules live in the repository root and read these on import
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+for var in ("PROJECT_ID", "TELEGRAM_API_TOKEN", "OBFUSCATION_TOKEN"):
+    os.environ.setdefault(var, "test")
+
+
+@pytest.fixture
+def standin(monkeypatch):
+    """Offline rating API stand-in the rating_api module is pointed at."""
+    import offline_standin
+    import rating_api
+
+    server = offline_standin.start_server(
+        offline_standin.generate_fixtures(pages=2, requests_per_venue=10)
+    )
+    monkeypatch.setattr(rating_api, "API_URL", server.url)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class FakeDatastoreClient:
+    """In-memory stand-in for the few Datastore client calls the tests make."""
+
+    def __init__(self):
+        self.entities = {}
+        self.gets = 0
+        self.puts = []
+
+    def key(self, *path):
+        from google.cloud import datastore as gds
+
+        return gds.Key(*path, project="test")
+
+    def get(self, key):
+        self.gets += 1
+        return self.entities.get(key.flat_path)
+
+    def get_multi(self, keys):
+        self.gets += 1
+        return [self.entities[k.flat_path] for k in keys if k.flat_path in self.entities]
+
+    def put(self, entity):
+        self.puts.append(entity.key.flat_path)
+        self.entities[entity.key.flat_path] = entity
+
+    def transaction(self):
+        return contextlib.nullcontext()
+
+
+@pytest.fixture
+def datastore_client(monkeypatch):
+    import datastore
+
+    client = FakeDatastoreClient()
+    monkeypatch.setattr(datastore, "_datastore_client", client)
+    return client
@@ -0,0 +1,110 @@
+import itertools
+import json
+import time
+import pytest
+from google.api_core import exceptions
+import command_queue
+import helpers
+
+_update_ids = itertools.count(1)
+
+
+class FakeTasksClient:
+    def __init__(self, error=None):
+        self.tasks = []
+        self.error = error
+
+    @staticmethod
+    def queue_path(project, location, queue):
+        return f"projects/{project}/locations/{location}/queues/{queue}"
+
+    def create_task(self, parent, task):
+        if self.error:
+            raise self.error
+        self.tasks.append((parent, task))
+
+
+@pytest.fixture
+def executed():
+    return []
+
+
+def make_backend(executed, error=None):
+    client = FakeTasksClient(error)
+    backend = command_queue.CloudTasksBackend(
+        lambda update, received_at: executed.append(update), client=client
+    )
+    return backend, client
+
+
+def make_update():
+    return {"update_id": next(_update_ids), "message": {"text": "/tourns"}}
+
+
+def test_cloud_tasks_backend_queues_the_update(executed):
+    backend, client = make_backend(executed)
+    update = make_update()
+
+    backend.submit(update, time.monotonic())
+
+    assert executed == []
+    [(parent, task)] = client.tasks
+    assert task["name"].startswith(f"{parent}/tasks/")
+    assert task["name"].endswith(f"-{update['update_id']}")
+    request = task["app_engine_http_request"]
+    assert request["relative_uri"] == f"{command_queue.WORKER_PATH}{helpers.OBFUSCATION_TOKEN}"
+    assert json.loads(request["body"])["update"] == update
+
+
+def test_cloud_tasks_backend_drops_redelivered_updates(executed):
+    backend, _ = make_backend(executed, exceptions.AlreadyExists("task exists"))
+    backend.submit(make_update(), time.monotonic())
+    assert executed == []
+
+
+def test_cloud_tasks_backend_executes_inline_when_the_queue_fails(executed):
+    backend, _ = make_backend(executed, exceptions.ServiceUnavailable("no queue"))
+    update = make_update()
+    backend.submit(update, time.monotonic())
+    assert executed == [update]
+
+
+def test_worker_task_runs_the_update(monkeypatch):
+    runs = []
+    monkeypatch.setattr(
+        command_queue, "execute", lambda update, received_at: runs.append(received_at)
+    )
+    update = make_update()
+    command_queue.execute_task(
+        {"update": update, "queued_for": 0.5, "queued_at": time.time() - 2}
+    )
+    # Waited 0.5 s before it was queued and 2 s in the queue
+    assert time.monotonic() - runs[0] == pytest.approx(2.5, abs=0.1)
+
+
+@pytest.mark.parametrize("backend_class,acked", [
+    (command_queue.InlineBackend, 0),
+    (command_queue.LocalBackend, 1),
+])
+def test_ack_latency_is_recorded_for_deferring_backends(monkeypatch, backend_class, acked):
+    monkeypatch.setattr(
+        command_queue, "_backend", backend_class(lambda update, received_at: None)
+    )
+    before = command_queue.get_stats()["acked"]
+    assert command_queue.enqueue(make_update(), time.monotonic())
+    assert command_queue.get_stats()["acked"] == before + acked
+
+
+def test_worker_route_accepts_queue_requests_only(monkeypatch):
+    import main
+
+    runs = []
+    monkeypatch.setattr(command_queue, "execute_task", runs.append)
+    client = main.app.test_client()
+    url = f"{command_queue.WORKER_PATH}{helpers.OBFUSCATION_TOKEN}"
+    payload = {"update": make_update(), "queued_for": 0, "queued_at": time.time()}
+
+    assert client.post(url, json=payload).status_code == 403
+    response = client.post(url, json=payload, headers={"X-AppEngine-QueueName": "commands"})
+    assert response.status_code == 200
+    assert runs == [payload]
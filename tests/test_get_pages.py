@@ -0,0 +1,109 @@
+import pytest
+import rating_client
+
+ENDPOINT = "tournaments"
+
+
+@pytest.fixture(autouse=True)
+def unknown_page_sizes(monkeypatch):
+    monkeypatch.setattr(rating_client, "_page_size_limits", {})
+    monkeypatch.setattr(rating_client, "_page_size_floors", {})
+
+
+def serve(standin, count):
+    items = [{"id": i} for i in range(count)]
+    standin.fixtures["tournaments"] = items
+    return items
+
+
+def get_pages(standin, page_size=100, max_pages=rating_client.MAX_PAGES):
+    return rating_client.get_pages(
+        lambda i, size: f"{standin.url}/tournaments?page={i}&itemsPerPage={size}",
+        page_size,
+        "Error in test",
+        max_pages=max_pages,
+    )
+
+
+def requests_made(sweep):
+    # Requests discarded by an earlier sweep may still reach the stand-in,
+    # the pages counted by get_pages() are exact
+    before = rating_client.get_connection_stats()["pages"]
+    result = sweep()
+    return result, rating_client.get_connection_stats()["pages"] - before
+
+
+def test_short_page_ends_the_sweep(standin):
+    items = serve(standin, 30)
+    # The first sweep requests page 2 together with page 1
+    result, made = requests_made(lambda: get_pages(standin))
+    assert result == items
+    assert made == 2
+    assert rating_client._page_size_floors == {ENDPOINT: 30}
+
+    # Pages are not capped below 30 items, pages up to 30 are the last
+    for count in (30, 12, 0):
+        items = serve(standin, count)
+        result, made = requests_made(lambda: get_pages(standin))
+        assert result == items
+        assert made == 1
+
+    # A longer short page may be capped, the next page is checked
+    items = serve(standin, 35)
+    result, made = requests_made(lambda: get_pages(standin))
+    assert result == items
+    assert made == 2
+    assert rating_client._page_size_floors == {ENDPOINT: 35}
+
+
+def test_full_page_makes_the_page_size_known(standin):
+    serve(standin, 250)
+    assert get_pages(standin) == [{"id": i} for i in range(250)]
+    assert rating_client._page_size_limits == {ENDPOINT: 100}
+
+    items = serve(standin, 30)
+    result, made = requests_made(lambda: get_pages(standin))
+    assert result == items
+    assert made == 1
+
+
+def test_capped_page_size_is_detected(standin, capsys):
+    standin.max_page_size = 40
+    items = serve(standin, 250)
+
+    assert get_pages(standin) == items
+    assert rating_client._page_size_limits == {ENDPOINT: 40}
+    assert f"Rating API returns 40 items per page of {ENDPOINT}" in capsys.readouterr().out
+
+    # Later sweeps ask for the capped size right away
+    items = serve(standin, 30)
+    result, made = requests_made(lambda: get_pages(standin))
+    assert result == items
+    assert made == 1
+
+
+def test_cap_above_the_probed_size_is_detected(standin, capsys):
+    serve(standin, 30)
+    get_pages(standin)
+    standin.max_page_size = 40
+    items = serve(standin, 250)
+
+    result, made = requests_made(lambda: get_pages(standin))
+
+    assert result == items
+    assert rating_client._page_size_limits == {ENDPOINT: 40}
+    assert f"Rating API returns 40 items per page of {ENDPOINT}" in capsys.readouterr().out
+
+
+def test_truncated_sweep_warns(standin, capsys):
+    serve(standin, 250)
+    truncated = rating_client.get_connection_stats()["truncated"]
+
+    result = get_pages(standin, page_size=50, max_pages=3)
+
+    assert result == [{"id": i} for i in range(150)]
+    assert rating_client.get_connection_stats()["truncated"] == truncated + 1
+    assert (
+        f"Warning: {ENDPOINT} has more than 3 pages of 50, "
+        "the result is truncated to 150 items"
+    ) in capsys.readouterr().out
@@ -0,0 +1,60 @@
+import os
+import random
+import re
+import helpers
+
+CORPUS = os.path.join(os.path.dirname(__file__), "tourn_names.txt")
+with open(CORPUS, encoding="utf-8") as f:
+    TOURN_NAMES = [line.strip() for line in f if line.strip()]
+
+FRAGMENTS = [
+    "асинхрон", "синхрон", "онлайн", "офлайн", "оффлайн", "асинхронный",
+    "синхронный", " и ", "и", "а/о", "а", "/", "о", "ua", "UA", "Ё", "ё",
+    ".", ",", "!", "«", "»", "-", " ", "  ", "\t", "Кубок", "лига", "2026",
+]
+
+
+def original_normalize_tourn_name(name):
+    """normalize_tourn_name before it was precompiled and memoized."""
+    norm_text = re.sub(
+        " +",
+        " ",
+        re.sub(r"[^\w\s]", "", name.lower().replace("а/о", "").replace("ё", "е")),
+    )
+    return (
+        norm_text.replace("асинхрон и", "")
+        .replace("синхрон и", "")
+        .replace("онлайн и", "")
+        .replace("офлайн и", "")
+        .replace("оффлайн и", "")
+        .replace("асинхронный и", "")
+        .replace("синхронный и", "")
+        .replace("асинхронный", "")
+        .replace("синхронный", "")
+        .replace("асинхрон", "")
+        .replace("синхрон", "")
+        .replace("онлайн", "")
+        .replace("офлайн", "")
+        .replace("оффлайн", "")
+        .replace("ua", "")
+        .strip()
+    )
+
+
+def test_corpus_names_match_original():
+    for name in TOURN_NAMES:
+        expected = original_normalize_tourn_name(name)
+        assert helpers.normalize_tourn_name(name) == expected, name
+
+
+def test_mutated_names_match_original():
+    rnd = random.Random(0)
+    for _ in range(20000):
+        parts = [rnd.choice(TOURN_NAMES)] if rnd.random() < 0.5 else []
+        parts += rnd.choices(FRAGMENTS, k=rnd.randint(1, 8))
+        rnd.shuffle(parts)
+        name = "".join(parts)
+        if rnd.random() < 0.3:
+            name = name.upper()
+        expected = original_normalize_tourn_name(name)
+        assert helpers.normalize_tourn_name(name) == expected, name
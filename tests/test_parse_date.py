@@ -0,0 +1,185 @@
+import datetime
+import types
+import dateparser
+import pytest
+import pytz
+import helpers
+
+TIMEZONE = "Europe/Moscow"
+TZ = pytz.timezone(TIMEZONE)
+# A Sunday afternoon
+NOW = TZ.localize(datetime.datetime(2026, 10, 18, 15, 0))
+
+
+class FrozenDatetime(datetime.datetime):
+    @classmethod
+    def now(cls, tz=None):
+        if tz is None:
+            # App Engine instances run in UTC
+            return NOW.astimezone(pytz.UTC).replace(tzinfo=None)
+        return NOW.astimezone(tz)
+
+
+@pytest.fixture(autouse=True)
+def frozen_now(monkeypatch):
+    """Pins "now" for both the fast path and dateparser."""
+    monkeypatch.setattr(
+        helpers,
+        "datetime",
+        types.SimpleNamespace(
+            datetime=FrozenDatetime,
+            date=datetime.date,
+            time=datetime.time,
+            timedelta=datetime.timedelta,
+        ),
+    )
+    parse = dateparser.parse
+
+    def parse_at_now(date_string, settings=None, **kwargs):
+        settings = dict(settings or {}, RELATIVE_BASE=NOW.replace(tzinfo=None))
+        return parse(date_string, settings=settings, **kwargs)
+
+    monkeypatch.setattr(dateparser, "parse", parse_at_now)
+
+
+@pytest.fixture
+def dateparser_only(monkeypatch):
+    monkeypatch.setattr(helpers, "_parse_common_date", lambda input_date, timezone: None)
+
+
+def at(month, day, hour=0, minute=0, year=2026):
+    return TZ.localize(datetime.datetime(year, month, day, hour, minute))
+
+
+# Inputs both paths resolve to the same moment
+SAME_AS_DATEPARSER = [
+    ("24.10 19:00", at(10, 24, 19)),
+    ("25.10", at(10, 25)),
+    ("завтра", NOW + datetime.timedelta(days=1)),
+    ("завтра 18:00", at(10, 19, 18)),
+    ("суббота", at(10, 24)),
+    ("суббота 13:00", at(10, 24, 13)),
+    ("в субботу 13:00", at(10, 24, 13)),
+    ("пятница 20:00", at(10, 23, 20)),
+    ("понедельник", at(10, 19)),
+    ("воскресенье 18:00", at(10, 18, 18)),
+    ("воскресенье 10:00", at(10, 25, 10)),
+    ("воскресенье", at(10, 25)),
+    ("во вторник", at(10, 20)),
+    # A time alone is today, or tomorrow once it has passed
+    ("20:00", at(10, 18, 20)),
+    ("в 20:00", at(10, 18, 20)),
+    ("10:00", at(10, 19, 10)),
+    ("9:05", at(10, 19, 9, 5)),
+    ("15:00", at(10, 19, 15)),
+]
+
+
+@pytest.mark.parametrize("text,expected", SAME_AS_DATEPARSER)
+def test_fast_path(text, expected):
+    assert helpers._parse_common_date(text, TIMEZONE) is not None
+    assert helpers.parse_date(text, TIMEZONE) == (expected, True)
+
+
+@pytest.mark.parametrize("text,expected", SAME_AS_DATEPARSER)
+def test_dateparser_path(dateparser_only, text, expected):
+    assert helpers.parse_date(text, TIMEZONE) == (expected, True)
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        # dateparser reads these as times of today (01:03, 18:10)
+        ("01.03", at(3, 1, year=2027)),
+        ("18.10", at(10, 18)),
+        # dateparser returns nothing for these "DD.MM HH:MM" dates
+        ("05.11 19:30", at(11, 5, 19, 30)),
+        ("5.11 9:05", at(11, 5, 9, 5)),
+        # dateparser drops "в 18" or reads it as a day of the month
+        ("завтра в 18", at(10, 19, 18)),
+        ("в пятницу в 20", at(10, 23, 20)),
+        ("в 20", at(10, 18, 20)),
+        ("в 9", at(10, 19, 9)),
+        # Today's weekday: later today while the time is ahead, next week once
+        # it has passed
+        ("воскресенье в 16", at(10, 18, 16)),
+        ("воскресенье в 15", at(10, 25, 15)),
+        ("воскресенье в 9", at(10, 25, 9)),
+        # dateparser's result is compared with the server time in UTC, so it
+        # keeps today for a time that has passed in the chat's timezone
+        ("воскресенье 13:00", at(10, 25, 13)),
+    ],
+)
+def test_fast_path_deviations(text, expected):
+    assert helpers.parse_date(text, TIMEZONE) == (expected, True)
+
+
+@pytest.mark.parametrize(
+    "title,expected",
+    [
+        ("Играем в субботу? До пятницы 20:00", at(10, 23, 20)),
+        ("Кто идёт до воскресенья", at(10, 25)),
+        ("Кто идёт до воскресенья 18:00", at(10, 18, 18)),
+        ("Голосуем до  24.10 19:00 ", at(10, 24, 19)),
+        ("Голосуем до завтра в 12", at(10, 19, 12)),
+        ("Голосуем до 20:00", at(10, 18, 20)),
+        ("Голосуем до 12:00", at(10, 19, 12)),
+    ],
+)
+def test_poll_closing_time(title, expected):
+    # The /poll command parses the text after "до" the same way
+    split_title = title.lower().split("до")
+    assert helpers.parse_date(split_title[1], TIMEZONE) == (expected, True)
+
+
+def test_compact_date():
+    assert helpers.parse_date("20261025", TIMEZONE) == (datetime.date(2026, 10, 25), False)
+
+
+def test_uncommon_formats_fall_back_to_dateparser():
+    assert helpers._parse_common_date("через 2 дня", TIMEZONE) is None
+    assert helpers.parse_date("через 2 дня", TIMEZONE) == (at(10, 20, 15), True)
+
+
+@pytest.mark.parametrize("text", ["31.02", "24.10 25:00"])
+def test_invalid_dates_fall_back_to_dateparser(text):
+    assert helpers._parse_common_date(text, TIMEZONE) is None
+
+
+def test_unparsed_input_is_today():
+    assert helpers.parse_date("когда-нибудь", TIMEZONE) == (NOW.date(), False)
+
+
+def day(month, day_, year=2026):
+    return datetime.date(year, month, day_)
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("20261024-20261026", (day(10, 24), day(10, 26))),
+        ("20261230 - 05.01", (day(12, 30), day(1, 5, 2027))),
+        # A range that has begun keeps its first day
+        ("17.10-19.10", (day(10, 17), day(10, 19))),
+        ("28.12-03.01", (day(12, 28), day(1, 3, 2027))),
+        # A range that is over means next year's
+        ("10.10-12.10", (day(10, 10, 2027), day(10, 12, 2027))),
+        ("01.03–05.03", (day(3, 1, 2027), day(3, 5, 2027))),
+        ("суббота-воскресенье", (day(10, 24), day(10, 25))),
+        ("пятница-понедельник", (day(10, 23), day(10, 26))),
+        ("вторник-вторник", (day(10, 20), day(10, 20))),
+        ("завтра-пятница", (day(10, 19), day(10, 23))),
+        ("24.10-пятница", (day(10, 24), day(10, 30))),
+        # At most MAX_RANGE_DAYS days
+        ("01.11-30.11", (day(11, 1), day(11, 14))),
+    ],
+)
+def test_date_range(text, expected):
+    assert helpers.parse_date_range(text, TIMEZONE) == expected
+
+
+@pytest.mark.parametrize(
+    "text", ["2026-10-24", "20261026-20261024", "19:00-21:00", "24.10", "суббота", "1-2", "31.02-01.03"]
+)
+def test_not_a_date_range(text):
+    assert helpers.parse_date_range(text, TIMEZONE) is None
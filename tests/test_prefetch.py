@@ -0,0 +1,53 @@
+import datetime
+import pytest
+import pytz
+import rating_api
+
+
+@pytest.fixture(autouse=True)
+def no_prefetched_window(monkeypatch):
+    monkeypatch.setattr(rating_api, "_prefetched_window", None)
+    monkeypatch.setattr(rating_api, "_prefetch_checked_at", 0)
+    rating_api._tourn_windows.clear()
+    yield
+    rating_api._tourn_windows.clear()
+
+
+def start_other_instance(monkeypatch):
+    monkeypatch.setattr(rating_api, "_prefetched_window", None)
+    monkeypatch.setattr(rating_api, "_prefetch_checked_at", 0)
+
+
+def tomorrow():
+    return datetime.datetime.now(pytz.utc).date() + datetime.timedelta(days=1)
+
+
+def test_other_instances_use_the_stored_window(standin, datastore_client, monkeypatch):
+    assert rating_api.prefetch_tourn_windows()
+    assert ("TournWindow", "prefetch") in datastore_client.entities
+
+    start_other_instance(monkeypatch)
+    calls = standin.get_counters()["tournaments"]
+    warm = rating_api.get_tourns_window(tomorrow())
+    assert standin.get_counters()["tournaments"] == calls
+
+    # The same window fetched from the API
+    start_other_instance(monkeypatch)
+    monkeypatch.setattr(rating_api, "_prefetch_checked_at", float("inf"))
+    cold = rating_api.get_tourns_window(tomorrow())
+    assert standin.get_counters()["tournaments"] > calls
+    assert warm and sorted(t["id"] for t in warm) == sorted(t["id"] for t in cold)
+
+
+def test_tick_on_another_instance_reuses_a_fresh_window(standin, datastore_client, monkeypatch):
+    assert rating_api.prefetch_tourn_windows()
+    start_other_instance(monkeypatch)
+    calls = standin.get_counters()["tournaments"]
+    assert not rating_api.prefetch_tourn_windows()
+    assert standin.get_counters()["tournaments"] == calls
+
+
+def test_stored_window_is_read_at_most_once_per_check_interval(datastore_client):
+    assert rating_api._get_prefetched_window() is None
+    assert rating_api._get_prefetched_window() is None
+    assert datastore_client.gets == 1
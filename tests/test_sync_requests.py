@@ -0,0 +1,15 @@
+import rating_api
+
+
+def test_sync_requests_without_valid_start_are_skipped(standin, capsys):
+    sync_reqs = standin.fixtures["venue_requests"]["3053"]
+    sync_reqs[0]["dateStart"] = "не дата"
+    del sync_reqs[1]["dateStart"]
+
+    result = rating_api.get_new_sync_requests("3053")
+
+    assert [r["id"] for r in result] == [str(r["id"]) for r in sync_reqs[2:]]
+    assert all(r["dateStart"].tzinfo is not None for r in result)
+    out = capsys.readouterr().out
+    assert f"invalid dateStart 'не дата' in sync request {sync_reqs[0]['id']}" in out
+    assert f"invalid dateStart None in sync request {sync_reqs[1]['id']}" in out
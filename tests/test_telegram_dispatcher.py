@@ -0,0 +1,24 @@
+import time
+import cache
+import telegram_dispatcher
+
+
+def test_only_idle_chat_buckets_expire(monkeypatch):
+    monkeypatch.setattr(
+        telegram_dispatcher,
+        "_chat_buckets",
+        cache.TTLCache(telegram_dispatcher.CHAT_BUCKETS_SIZE, telegram_dispatcher.CHAT_BUCKET_IDLE_TTL),
+    )
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now)
+
+    active = telegram_dispatcher._get_chat_bucket("-100")
+    idle = telegram_dispatcher._get_chat_bucket("42")
+    assert active.rate == telegram_dispatcher.GROUP_CHAT_RATE
+    assert idle.rate == telegram_dispatcher.PRIVATE_CHAT_RATE
+
+    # The group chat is messaged every 40 s, the private chat is not
+    for _ in range(3):
+        now += 40
+        assert telegram_dispatcher._get_chat_bucket("-100") is active
+    assert telegram_dispatcher._get_chat_bucket("42") is not idle
@@ -0,0 +1,62 @@
+import pytest
+import datastore
+import rating_api
+
+VENUE_ID = "3053"
+INDEX = ("VenuePlayedTourns", VENUE_ID)
+CHECK = ("VenuePlayedTournsCheck", VENUE_ID)
+
+
+@pytest.fixture
+def sweeps(monkeypatch):
+    calls = []
+
+    def get_sync_requests_ids(venue_id, months):
+        calls.append(venue_id)
+        return ["101"]
+
+    monkeypatch.setattr(rating_api, "get_sync_requests_ids", get_sync_requests_ids)
+    monkeypatch.setattr(
+        rating_api, "get_tourn_by_request", lambda request_id, timezone: (7, "2099-01-01")
+    )
+    monkeypatch.setattr(
+        rating_api,
+        "get_tourn_by_id",
+        lambda tourn_id, static_only=False: {
+            "name": "Кубок",
+            "editors": [{"name": "Анна", "surname": "Иванова"}],
+        },
+    )
+    monkeypatch.setattr(datastore, "_venue_played_tourns_refreshed_at", {})
+    return calls
+
+
+def start_other_instance():
+    datastore._venue_played_tourns_refreshed_at.clear()
+
+
+def age_index(datastore_client, seconds):
+    for path in (INDEX, CHECK):
+        entity = datastore_client.entities.get(path)
+        if entity:
+            for name in ("updated_at", "checked_at"):
+                if name in entity:
+                    entity[name] -= seconds
+
+
+def test_unchanged_index_is_checked_without_rewrite(datastore_client, sweeps):
+    [played] = datastore.update_venue_played_tourns(VENUE_ID)
+    assert played["tourn_id"] == 7
+    assert datastore_client.puts == [INDEX]
+
+    # An hour later the index is stale, the API has nothing new
+    age_index(datastore_client, datastore.VENUE_PLAYED_TOURNS_REFRESH + 1)
+    start_other_instance()
+    assert datastore.update_venue_played_tourns(VENUE_ID) == [played]
+    assert len(sweeps) == 2
+    assert datastore_client.puts == [INDEX, CHECK]
+
+    # Other instances find the index up to date and do not sweep the API
+    start_other_instance()
+    assert datastore.update_venue_played_tourns(VENUE_ID) == [played]
+    assert len(sweeps) == 2